@@ -5,7 +5,7 @@ Leontief A-matrix and extensions, or alternatively as supply and use tables for
 the unallocated version of ecoinvent.
 
 :PythonVersion:  3
-:Dependencies: pandas 0.14.1 or more recent, scipy, numpy, lxml and xml
+:Dependencies: pandas 0.14.1 or more recent, scipy, numpy and lxml
 
 License: BDS
 
@@ -41,32 +41,32 @@ Credits:
 import pdb
 import os
 import glob
+import shutil
 import io
 import pkgutil
 import subprocess
 from lxml import objectify
-import xml.etree.ElementTree as ET
+from lxml import etree
 import pandas as pd
 _df = pd.DataFrame
 import numpy as np
 import scipy.sparse
+import scipy.sparse.linalg
 import scipy.io
 import logging
 import pickle
 import gzip
+import array
 import csv
 import shelve
 import hashlib
+import mmap
 import sqlite3
 import h5py
-try:
-    import IPython
-except:
-    pass
 import re
-import xlrd
+import functools
 import xlwt
-import copy
+import concurrent.futures
 try:
     from .version import __version__
 except:
@@ -86,15 +86,39 @@ class Ecospold2Matrix(object):
 
     # Some hardcoded stuff
     __PRE = '{http://www.EcoInvent.org/EcoSpold02}'
+    # Namespace-qualified tags, built once rather than at every lookup
+    __TAG = dict()
+    for _tag in ('activity', 'activityDescription', 'activityIndexEntry',
+                 'activityName', 'classification', 'classificationSystem',
+                 'classificationValue', 'compartment', 'elementaryExchange',
+                 'geography', 'inputGroup', 'intermediateExchange',
+                 'macroEconomicScenario', 'name', 'outputGroup', 'property',
+                 'shortname', 'subcompartment', 'technology', 'unitName'):
+        __TAG[_tag] = __PRE + _tag
+    del _tag
+
+    # Parsing options shared by all ecospold files: no whitespace-only text
+    # nodes, no xml:id hash table, no external resources
+    __XMLOPTIONS = dict(remove_blank_text=True, huge_tree=True,
+                        collect_ids=False, resolve_entities=False,
+                        no_network=True)
+
+    # Buffer for (large) pickle files, to write and read in few system calls
+    __PICKLEBUFFER = 4 * 1024 * 1024
+
+    # Compression of exported pickles: fast gzip levels shrink them nearly as
+    # much as the default (9) at a fraction of the cost
+    __GZIPLEVEL = 3
+
     __ELEXCHANGE = 'ElementaryExchanges.xml'
     __INTERMEXCHANGE = 'IntermediateExchanges.xml'
     __ACTIVITYINDEX = 'ActivityIndex.xml'
     __ACTIVITYNAMES = 'ActivityNames.xml'
     __DB_CHARACTERISATION = 'characterisation.db'
     rtolmin = 1e-16  # 16 significant digits being roughly the limit of float64
-    __TechnologyLevels = pd.Series(
-            ['Undefined', 'New', 'Modern', 'Current', 'Old', 'Outdated'],
-            index=[0, 1, 2, 3, 4, 5])
+    # Technology level names, indexed by their ecospold code
+    __TechnologyLevels = ('Undefined', 'New', 'Modern', 'Current', 'Old',
+                          'Outdated')
     __CUTOFFTXT ="Recycled Content cut-off"
     __SYNONYMS_IMPACT_UNITS = {'unitName': 'impact_score_unit',
                                'Unit': 'impact_score_unit'}
@@ -168,6 +192,15 @@ class Ecospold2Matrix(object):
             * optionally, aggregate sources to generate a fully untraceable SUT
             * Save to file
 
+        Parallel parsing:
+        -----------------
+
+        Set self.max_workers to more than 1 (or None, one per CPU) to parse
+        ecospold files in worker processes. Where these are spawned (Windows,
+        macOS, and Linux from Python 3.14), each worker re-imports the
+        calling script, which must therefore create and run the parser under
+        an if __name__ == '__main__': guard.
+
 
         """
 
@@ -187,6 +220,8 @@ class Ecospold2Matrix(object):
         self.PRO = None             # Process labels, rows/cols of A-matrix
         self.STR = None             # Factors labels, rows extensions
         self.IMP = pd.DataFrame([])             # impact categories
+        # (A, F, Z and G_pro are DataFrames of sparse format self.sformat,
+        #  assembled as scipy.sparse matrices by build_AF)
         self.A = None               # Normalized Leontief coefficient matrix
         self.F = None               # Normalized factors of production,i.e.,
                                     #       elementary exchange coefficients
@@ -253,13 +288,26 @@ class Ecospold2Matrix(object):
         self.save_interm = True
         self.prefer_pickles = False
 
+        # max_workers: number of processes parsing ecospold datasets, and of
+        # threads writing CSV files, in parallel [Default: 1, everything in
+        # this process; None for one per CPU]. Worker processes may re-import
+        # the calling script (spawn/forkserver start methods), which must then
+        # guard its code with if __name__ == '__main__':
+        self.max_workers = 1
+
+        # SHA-1 digests already computed, keyed by (path, mtime, size)
+        self.__hashes = {}
+
+        # Lists of ecospold files already found, keyed by folder
+        self.__spold_files = {}
+
         # CREATE DIRECTORIES IF NOT IN EXISTENCE
         if out_dir and not os.path.exists(self.out_dir):
             os.makedirs(self.out_dir)
         self.log_dir = os.path.join(self.out_dir, self.project_name + '_log')
 
         # Fresh new log
-        os.system('rm -Rf ' + self.log_dir)
+        shutil.rmtree(self.log_dir, ignore_errors=True)
         os.makedirs(self.log_dir)
 
 
@@ -314,10 +362,12 @@ class Ecospold2Matrix(object):
                       ', '.join([i for i in self.STR_order]))
 
         database_name = self.project_name + '_' + self.__DB_CHARACTERISATION
-        os.system('rm ' + database_name)
         try:
-            self.conn = sqlite3.connect(
-                    self.project_name + '_' + self.__DB_CHARACTERISATION)
+            os.remove(database_name)
+        except FileNotFoundError:
+            pass
+        try:
+            self.conn = sqlite3.connect(database_name)
             self.initialize_database()
         except:
             self.log.warning("Could not establish connection to database")
@@ -449,7 +499,6 @@ class Ecospold2Matrix(object):
         * fileformats : List of file formats in which to save data
                         [Default: None, save to all possible file formats]
                          Options: 'Pandas'       --> pandas dataframes
-                                  'SparsePandas' --> sparse pandas dataframes,
                                   'SparseMatrix' --> scipy AND matlab sparse
                                   'csv'          --> text files
 
@@ -532,7 +581,7 @@ class Ecospold2Matrix(object):
         if self.prefer_pickles and os.path.exists(filename):
 
             # Read all flows
-            with open(filename, 'rb') as f:
+            with open(filename, 'rb', self.__PICKLEBUFFER) as f:
                 [self.inflows,
                  self.elementary_flows,
                  self.outflows] = pickle.load(f)
@@ -549,10 +598,11 @@ class Ecospold2Matrix(object):
 
             # optionally, pickle for further use
             if self.save_interm:
-                with open(filename, 'wb') as f:
+                with open(filename, 'wb', self.__PICKLEBUFFER) as f:
                     pickle.dump([self.inflows,
                                  self.elementary_flows,
-                                 self.outflows], f)
+                                 self.outflows], f,
+                                pickle.HIGHEST_PROTOCOL)
 
                 # Log event
                 sha1 = self.__hash_file(filename)
@@ -602,7 +652,7 @@ class Ecospold2Matrix(object):
         if self.prefer_pickles and os.path.exists(filename):
 
             # Load from pickled file
-            with open(filename, 'rb') as f:
+            with open(filename, 'rb', self.__PICKLEBUFFER) as f:
                 self.PRO, self.STR = pickle.load(f)
 
                 # Log event
@@ -618,8 +668,9 @@ class Ecospold2Matrix(object):
 
             # and optionally pickle for further use
             if self.save_interm:
-                with open(filename, 'wb') as f:
-                    pickle.dump([self.PRO, self.STR], f)
+                with open(filename, 'wb', self.__PICKLEBUFFER) as f:
+                    pickle.dump([self.PRO, self.STR], f,
+                                pickle.HIGHEST_PROTOCOL)
 
                 # Log event
                 sha1 = self.__hash_file(filename)
@@ -653,7 +704,7 @@ class Ecospold2Matrix(object):
 
         # EITHER LOAD FROM PREVIOUS ROUND...
         if self.prefer_pickles and os.path.exists(filename):
-            with open(filename, 'rb') as f:
+            with open(filename, 'rb', self.__PICKLEBUFFER) as f:
                 self.E = pickle.load(f)
 
                 # log event
@@ -667,8 +718,8 @@ class Ecospold2Matrix(object):
 
             # optionally, pickle for further use
             if self.save_interm:
-                with open(filename, 'wb') as f:
-                    pickle.dump(self.E, f)
+                with open(filename, 'wb', self.__PICKLEBUFFER) as f:
+                    pickle.dump(self.E, f, pickle.HIGHEST_PROTOCOL)
 
                 # log event
                 sha1 = self.__hash_file(filename)
@@ -699,59 +750,67 @@ class Ecospold2Matrix(object):
         self._prop_dict = dict()
         fp = os.path.join(self.sys_dir, "MasterData", "Properties.xml")
         assert os.path.exists(fp), "Can't find Properties.xml"
-        with open(fp, 'r', encoding='utf-8') as fh:
-            root=objectify.parse(fh).getroot()
-        for prop in root.property:
-            if prop.name in self.PRO_properties:
-                try:
-                    self._prop_dict[prop.get('id')] = prop.name + ' [' + prop.unitName + ']'
-                except AttributeError: # Most likely the unit is not defined
-                    self._prop_dict[prop.get('id')] = prop.name + ' [unitless]'
-
+        for _, prop in etree.iterparse(fp, events=('end',),
+                                       tag=self.__TAG['property'],
+                                       **self.__XMLOPTIONS):
+            name = prop.findtext(self.__TAG['name'])
+            if name in self.PRO_properties:
+                unit = prop.findtext(self.__TAG['unitName'])
+                if unit is None:  # Most likely the unit is not defined
+                    unit = 'unitless'
+                self._prop_dict[prop.get('id')] = name + ' [' + unit + ']'
+            _release(prop)
 
         # The file to parse
         fp = os.path.join(self.sys_dir, 'MasterData', self.__INTERMEXCHANGE)
         assert os.path.exists(fp), "Can't find " + self.__INTERMEXCHANGE
 
-        def extract_metadata(o):
-            """ Subfunction to get the data from lxml root object """
+        # Get id, name, unitId, unitName and CPC code for all intermediate
+        # exchanges, streaming through the file one exchange at a time
+        names = []
+        unit_names = []
+        ids = []
+        unit_ids = []
+        cpcs = []
+        props = dict()
+        context = etree.iterparse(fp, events=('end',),
+                                  tag=self.__TAG['intermediateExchange'],
+                                  **self.__XMLOPTIONS)
+        for i, (_, o) in enumerate(context):
 
-            # Get list of id, name, unitId, and unitName for all intermediate
-            # exchanges
             cpc = None
-
-            for classification in o.classification:
-                if classification.classificationSystem.text == 'CPC':
-                    cpc = classification.classificationValue.text
-
-            meta= {'productName': o.name.text,
-                    'unitName': o.unitName.text,
-                    'productId': o.get('id'),
-                    'unitId': o.get('unitId'),
-                    'cpc': cpc,
-                    }
+            for classification in o.iterfind(self.__TAG['classification']):
+                system = classification.findtext(
+                        self.__TAG['classificationSystem'])
+                if system == 'CPC':
+                    cpc = classification.findtext(
+                            self.__TAG['classificationValue'])
+
+            names.append(o.findtext(self.__TAG['name']))
+            unit_names.append(o.findtext(self.__TAG['unitName']))
+            ids.append(o.get('id'))
+            unit_ids.append(o.get('unitId'))
+            cpcs.append(cpc)
 
             # Among all properties (if any) of exchange (object o)
             # Store those properties that were selected in PRO_properties
-            try:
-                for prop in o.property:
-                    try:
-                        meta[self._prop_dict[prop.get('propertyId')]] = prop.get('amount')
-                    except KeyError:
-                        pass
-            except AttributeError:
-                pass
-
-
-            return meta
-
-        # Parse XML file
-        with open(fp, 'r', encoding="utf-8") as fh:
-            root = objectify.parse(fh).getroot()
-        pro_list = [extract_metadata(ds) for ds in root.iterchildren()]
-
-        # Convert this list into a dataFrame
-        self.products = pd.DataFrame(pro_list)
+            for prop in o.iterfind(self.__TAG['property']):
+                try:
+                    col = self._prop_dict[prop.get('propertyId')]
+                except KeyError:
+                    continue
+                props.setdefault(col, dict())[i] = prop.get('amount')
+
+            _release(o)
+
+        # Convert these lists into a dataFrame
+        self.products = pd.DataFrame({'productName': names,
+                                      'unitName': unit_names,
+                                      'productId': ids,
+                                      'unitId': unit_ids,
+                                      'cpc': cpcs})
+        for col, values in props.items():
+            self.products[col] = pd.Series(values, dtype=object)
         self.products.index = self.products['productId']
         self.products.index.name = None
 
@@ -778,45 +837,54 @@ class Ecospold2Matrix(object):
         activity_file = os.path.join(self.sys_dir,
                                      'MasterData',
                                      self.__ACTIVITYINDEX)
-        root = ET.parse(activity_file).getroot()
-
-        # Get list of activities and their core attributes
-        act_list = []
-        for act in root:
-            act_list.append([act.attrib['id'],
-                             act.attrib['activityNameId'],
-                             act.attrib['specialActivityType'],
-                             act.attrib['startDate'],
-                             act.attrib['endDate']])
-
-
-        # Remove any potential duplicates
-        act_list, _, _, _ = self.__deduplicate(act_list, 0, 'activity_list')
-
-        # Convert to dataFrame
-        self.activities = pd.DataFrame(act_list,
-                                       columns=('activityId',
-                                                'activityNameId',
-                                                'activityType',
-                                                'startDate',
-                                                'endDate'),
-                                       index=[row[0] for row in act_list])
-        self.activities['activityType'
-                       ] = self.activities['activityType'].astype(int)
-
-        # Parse XML file with activity names
-        activity_name_file = os.path.join(self.sys_dir, 'MasterData', self.__ACTIVITYNAMES)
-        with open(activity_name_file, 'r', encoding='utf-8') as f:
-            root = objectify.parse(f).getroot()
-        names = dict()
-        for act in root.activityName:
-            names[act.attrib['id']] = act.name
-        names = pd.DataFrame.from_dict(names, orient='index').squeeze().astype('str')
-        names.name = 'activityName'
-
-        # Merge the two datasets
-        self.activities = pd.merge(self.activities, names, how='left',
-                                   left_on='activityNameId', right_index=True)
+        activity_name_file = os.path.join(self.sys_dir, 'MasterData',
+                                          self.__ACTIVITYNAMES)
+
+        def parse():
+            # Get list of activities and their core attributes, streaming
+            # through the file one entry at a time
+            act_list = []
+            for _, act in etree.iterparse(activity_file, events=('end',),
+                                          tag=self.__TAG['activityIndexEntry'],
+                                          **self.__XMLOPTIONS):
+                act_list.append([act.attrib['id'],
+                                 act.attrib['activityNameId'],
+                                 act.attrib['specialActivityType'],
+                                 act.attrib['startDate'],
+                                 act.attrib['endDate']])
+                _release(act)
+
+            # Remove any potential duplicates
+            act_list, _, _, _ = self.__deduplicate(act_list, 0,
+                                                   'activity_list')
+
+            # Convert to dataFrame
+            activities = pd.DataFrame(act_list,
+                                      columns=('activityId',
+                                               'activityNameId',
+                                               'activityType',
+                                               'startDate',
+                                               'endDate'))
+            activities.index = activities['activityId']
+            activities.index.name = None
+            activities['activityType'] = activities['activityType'].astype(int)
+
+            # Parse XML file with activity names
+            names = dict()
+            for _, act in etree.iterparse(activity_name_file, events=('end',),
+                                          tag=self.__TAG['activityName'],
+                                          **self.__XMLOPTIONS):
+                names[act.attrib['id']] = act.findtext(self.__TAG['name'])
+                _release(act)
+            names = pd.Series(names, name='activityName',
+                              dtype=object).astype('str')
+
+            # Merge the two datasets
+            return pd.merge(activities, names, how='left',
+                            left_on='activityNameId', right_index=True)
+
+        self.activities = self.__cached(parse, activity_file,
+                                        activity_name_file)
 
         # Log event
         sha1 = self.__hash_file(activity_file)
@@ -846,78 +914,27 @@ class Ecospold2Matrix(object):
 
         # Get list of ecoSpold files to process
         data_folder = os.path.join(self.sys_dir, 'datasets')
-        spold_files = glob.glob(os.path.join(data_folder, '*.spold'))
+        spold_files = self.__list_spold_files(data_folder)
 
         # Log event
         self.log.info('Processing {} files in {}'.format(len(spold_files),
                                                          data_folder))
 
-        # ONE FILE AT A TIME
-        for sfile in spold_files:
-
-            # Get activityId from file name
-            current_file = os.path.basename(sfile)
-            current_id = os.path.splitext(current_file)[0]
-
-            # For each file, find flow data
-            root = ET.parse(sfile).getroot()
-            child_ds = root.find(self.__PRE + 'childActivityDataset')
-            if child_ds is None:
-                child_ds = root.find(self.__PRE + 'activityDataset')
-            flow_ds = child_ds.find(self.__PRE + 'flowData')
-
-            # GO THROUGH EACH FLOW IN TURN
-            for entry in flow_ds:
-
-                # Get magnitude of flow
-                try:
-                    _amount = float(entry.attrib.get('amount'))
-                except:
-                    # Get ID of failed amount
-                    _fail_id = entry.attrib.get('elementaryExchangeId',
-                                                'not found')
-                    if _fail_id == 'not found':
-                        _fail_id = entry.attrib.get('intermediateExchangeId',
-                                                    'not found')
-
-                    # Log failure
-                    self.log.warn("Parser warning: flow in {0} cannot be"
-                                  " converted' 'to float. Id: {1} - amount:"
-                                  " {2}".format(str(current_file),
-                                                _fail_id,
-                                                _amount))
-                    continue
-
-                if _amount == 0:   # Ignore entries of magnitude zero
-                    continue
-
-                #  GET OBJECT, DESTINATION AND/OR ORIGIN OF EACH FLOW
-
-                # ... for elementary flows
-                if entry.tag == self.__PRE + 'elementaryExchange':
-                    elementary_flows.append([
-                                current_id,
-                                entry.attrib.get('elementaryExchangeId'),
-                                _amount])
-
-                elif entry.tag == self.__PRE + 'intermediateExchange':
-
-                    # ... or product use
-                    if entry.find(self.__PRE + 'inputGroup') is not None:
-                        inflow_list.append([
-                                current_id,
-                                entry.attrib.get('activityLinkId'),
-                                entry.attrib.get('intermediateExchangeId'),
-                                _amount])
-
-                    # ... or product supply.
-                    elif entry.find(self.__PRE + 'outputGroup') is not None:
-                        outflow_list.append([
-                                current_id,
-                                entry.attrib.get('intermediateExchangeId'),
-                                _amount,
-                                entry.attrib.get('productionVolumeAmount'),
-                                entry.find(self.__PRE + 'outputGroup').text])
+        # ONE FILE AT A TIME, files spread over worker processes
+        if self.max_workers == 1:
+            parsed = list(map(self._parse_flow_data, spold_files))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers) as pool:
+                parsed = list(pool.map(self._parse_flow_data, spold_files,
+                                       chunksize=64))
+
+        for inflows, elflows, outflows, failures in parsed:
+            inflow_list.extend(inflows)
+            elementary_flows.extend(elflows)
+            outflow_list.extend(outflows)
+            for msg in failures:
+                self.log.warn(msg)
 
         # Check for duplicates in outputflows
         #   there should really only be one output flow per activity
@@ -945,14 +962,111 @@ class Ecospold2Matrix(object):
                                     'productId',
                                     'amount',
                                     'productionVolume',
-                                    'outputGroup'],
-                           index=[row[0] for row in outflow_list])
-        out['productionVolume'] = out['productionVolume'].astype(float)
-        out['outputGroup'] = out['outputGroup'].astype(int)
+                                    'outputGroup'])
+        out.index = out['fileId']
+        out.index.name = None
+        out = out.astype({'productionVolume': float, 'outputGroup': int})
         self.outflows = out
         self.outflows['amount'].astype(self.format, copy=False)
 
 
+    @staticmethod
+    def _parse_flow_data(sfile):
+        """ Extracts the flows of a single ecospold file
+
+        Kept free of any object state so that it can run in worker processes
+
+        Args:
+        -----
+        * sfile: path to ecospold dataset file
+
+        Returns:
+        --------
+        * inflows, elementary_flows, outflows: lists of flows, as expected by
+                                               extract_flows()
+        * failures: list of warning messages for unparsable amounts
+
+        """
+        inflow_list = []
+        outflow_list = []
+        elementary_flows = []
+        failures = []
+
+        # Get activityId from file name
+        current_file = os.path.basename(sfile)
+        current_id = os.path.splitext(current_file)[0]
+
+        # Tags looked up at every flow
+        ELEM = Ecospold2Matrix.__TAG['elementaryExchange']
+        INT = Ecospold2Matrix.__TAG['intermediateExchange']
+        INGROUP = Ecospold2Matrix.__TAG['inputGroup']
+        OUTGROUP = Ecospold2Matrix.__TAG['outputGroup']
+
+        # For each file, stream through flow data
+        exchanges = (ELEM, INT)
+        context = etree.iterparse(sfile, events=('end',), tag=exchanges,
+                                  **Ecospold2Matrix.__XMLOPTIONS)
+
+        # GO THROUGH EACH FLOW IN TURN
+        for _, entry in context:
+
+            # Free the flows already processed
+            while entry.getprevious() is not None:
+                del entry.getparent()[0]
+
+            # Get magnitude of flow
+            amount = entry.get('amount')
+            try:
+                _amount = float(amount)
+            except (TypeError, ValueError):
+                # Get ID of failed amount
+                _fail_id = entry.get('elementaryExchangeId',
+                                     entry.get('intermediateExchangeId',
+                                               'not found'))
+
+                # Log failure
+                failures.append("Parser warning: flow in {0} cannot be"
+                                " converted' 'to float. Id: {1} - amount:"
+                                " {2}".format(str(current_file),
+                                              _fail_id,
+                                              amount))
+                continue
+
+            if _amount == 0:   # Ignore entries of magnitude zero
+                continue
+
+            #  GET OBJECT, DESTINATION AND/OR ORIGIN OF EACH FLOW
+
+            # ... for elementary flows
+            if entry.tag == ELEM:
+                elementary_flows.append([
+                            current_id,
+                            entry.get('elementaryExchangeId'),
+                            _amount])
+
+            elif entry.tag == INT:
+
+                # ... or product use
+                if entry.find(INGROUP) is not None:
+                    inflow_list.append([
+                            current_id,
+                            entry.get('activityLinkId'),
+                            entry.get('intermediateExchangeId'),
+                            _amount])
+
+                # ... or product supply.
+                else:
+                    output_group = entry.find(OUTGROUP)
+                    if output_group is not None:
+                        outflow_list.append([
+                                current_id,
+                                entry.get('intermediateExchangeId'),
+                                _amount,
+                                entry.get('productionVolumeAmount'),
+                                output_group.text])
+
+        return inflow_list, elementary_flows, outflow_list, failures
+
     def build_STR(self):
         """ Parses ElementaryExchanges.xml to builds stressor labels
 
@@ -980,33 +1094,47 @@ class Ecospold2Matrix(object):
         fp = os.path.join(self.sys_dir, 'MasterData', self.__ELEXCHANGE)
         assert os.path.exists(fp), "Can't find ElementaryExchanges.xml"
 
-        def extract_metadata(o):
-            """ Subfunction to extract data from lxml root object """
-            return {
-                'id': o.get('id'),
-                'name': o.name.text,
-                'unit': o.unitName.text,
-                'cas': o.get('casNumber'),
-                'comp': o.compartment.compartment.text,
-                'subcomp': o.compartment.subcompartment.text
-            }
-
-        # Extract data from file
-        with open(fp, 'r', encoding="utf-8") as fh:
-            root = objectify.parse(fh).getroot()
-            self.STR = _df([extract_metadata(i) for i in root.iterchildren()])
-
-        # organize in pandas DataFrame
-        self.STR.index = self.STR['id']
-        self.STR = self.STR.reindex(['id', 'name', 'unit', 'cas', 'comp', 'subcomp'], axis=1)
-        self.STR = self.STR.sort_values(by=self.STR_order)
+        def parse():
+            # Extract data from file, one list per column, streaming through
+            # the file one exchange at a time
+            ids = []
+            names = []
+            units = []
+            cas = []
+            comps = []
+            subcomps = []
+            for _, o in etree.iterparse(fp, events=('end',),
+                                        tag=self.__TAG['elementaryExchange'],
+                                        **self.__XMLOPTIONS):
+                ids.append(o.get('id'))
+                names.append(o.findtext(self.__TAG['name']))
+                units.append(o.findtext(self.__TAG['unitName']))
+                cas.append(o.get('casNumber'))
+                compartment = o.find(self.__TAG['compartment'])
+                comps.append(compartment.findtext(self.__TAG['compartment']))
+                subcomps.append(compartment.findtext(
+                        self.__TAG['subcompartment']))
+                _release(o)
+
+            # organize in pandas DataFrame
+            STR = _df({'id': ids,
+                       'name': names,
+                       'unit': units,
+                       'cas': cas,
+                       'comp': comps,
+                       'subcomp': subcomps})
+            STR.index = STR['id']
+            return STR
+
+        self.STR = self.__cached(parse, fp)
+        self.STR = _sort_labels(self.STR, self.STR_order)
 
         # Log event
         sha1 = self.__hash_file(fp)
         msg = "{} extracted from {} with SHA-1 of {}"
         self.log.info(msg.format('Elementary flows', self.__ELEXCHANGE, sha1))
 
-    def build_PRO(self):
+    def build_PRO(self, detail_level=1):
         """ Builds minimalistic intermediate exchange process labels
 
         This functions parses all files in dataset folder.  The list is
@@ -1014,8 +1142,15 @@ class Ecospold2Matrix(object):
         filename of the files in the DATASET folder.
 
 
-        Args: None
+        Args:
         ----
+        * detail_level: 1 [default] parses each dataset for its labels; 0
+                        only reads the activity and product Ids encoded in
+                        the file names, without any XML parsing, and leaves
+                        names to complement_labels(). All other labels are
+                        then NaN, so steps that rely on them to fix sources
+                        (missing activities, geography rules of
+                        __fix_flow_sources) need level 1
 
         Behaviour influenced by:
         ------------------------
@@ -1038,28 +1173,23 @@ class Ecospold2Matrix(object):
         # Use ecospold filenames as indexes (they combine activity Id and
         # reference-product Id)
         data_folder = os.path.join(self.sys_dir, 'datasets')
-        spold_files = glob.glob(os.path.join(data_folder, '*.spold'))
-
-        # in eco3.5 there is an annoying number in front of the file_index
-        listindex = []
-        for fn in spold_files:
-            if len(os.path.splitext(os.path.basename(fn))[0].split('_')) == 2:
-                listindex.append(os.path.splitext(os.path.basename(fn))[0])
-            elif len(os.path.splitext(os.path.basename(fn))[0].split('_')) == 3:
-                listindex.append(os.path.splitext(os.path.basename(fn))[0].split('_')[1] + '_' +
-                                 os.path.splitext(os.path.basename(fn))[0].split('_')[2])
-
-        # Initialize empty DataFrame
-        PRO = pd.DataFrame(index=listindex, columns=('activityId',
-                                               'productId',
-                                               'activityName',
-                                               'ISIC',
-                                               'price',
-                                               'priceUnit',
-                                               'EcoSpoldCategory',
-                                               'geography',
-                                               'technologyLevel',
-                                               'macroEconomicScenario'))
+        spold_files = self.__list_spold_files(data_folder)
+
+        # Ids only, straight from filenames (minus eco3.5 leading number)
+        if detail_level == 0:
+            listindex = ['_'.join(os.path.splitext(os.path.basename(i)
+                                                   )[0].split('_')[-2:])
+                         for i in spold_files]
+            PRO = pd.DataFrame([i.split('_') for i in listindex],
+                               columns=['activityId', 'productId'],
+                               index=listindex)
+            for col in ('activityName', 'ISIC', 'price', 'priceUnit',
+                        'EcoSpoldCategory', 'geography', 'technologyLevel',
+                        'macroEconomicScenario',
+                        *getattr(self, '_prop_dict', {}).values()):
+                PRO[col] = np.nan
+            self.PRO = _sort_labels(PRO, self.PRO_order)
+            return
 
         # LOOP THROUGH ALL FILES TO EXTRACT ADDITIONAL DATA
         # -------------------------------------------------
@@ -1069,125 +1199,168 @@ class Ecospold2Matrix(object):
             msg_many_files = 'Processing {} files - this may take a while ...'
             self.log.info(msg_many_files.format(len(spold_files)))
 
-        for sfile in spold_files:
-
-            # Remove filename extension
-            if len(os.path.splitext(os.path.basename(sfile))[0].split('_')) == 2:
-                file_index = os.path.splitext(os.path.basename(sfile))[0]
-            elif len(os.path.splitext(os.path.basename(sfile))[0].split('_')) == 3:
-                file_index = os.path.splitext(os.path.basename(sfile))[0].split('_')[1] + '_' + \
-                             os.path.splitext(os.path.basename(sfile))[0].split('_')[2]
-
-            # Parse xml tree
-            root = ET.parse(sfile).getroot()
-
-            # Record product Id
-            activity_id, productId = file_index.split('_')
-            PRO.loc[file_index, 'productId'] = productId  # TODO: this is actually an exchange ID, no?
-
-
-            # Find activity dataset
-            child_ds = root.find(self.__PRE + 'childActivityDataset')
-            if child_ds is None:
-                child_ds = root.find(self.__PRE + 'activityDataset')
-            activity_ds = child_ds.find(self.__PRE + 'activityDescription')
-
-            # Loop through activity dataset attributes
-            for entry in activity_ds:
+        # ONE FILE AT A TIME, files spread over worker processes; without
+        # extract_products(), no properties of interest are known
+        prop_dicts = [getattr(self, '_prop_dict', {})] * len(spold_files)
+        if self.max_workers == 1:
+            parsed = list(map(self._parse_PRO_data, spold_files, prop_dicts))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers) as pool:
+                parsed = list(pool.map(self._parse_PRO_data, spold_files,
+                                       prop_dicts, chunksize=64))
 
-                # Get name, id, etc
-                if entry.tag == self.__PRE + 'activity':
-                    PRO.loc[file_index, 'activityId'] = entry.attrib['id']
-                    PRO.loc[file_index, 'activityName'] = entry.find(
-                            self.__PRE + 'activityName').text
-                    continue
+        listindex = []
+        rows = []
+        for file_index, row, failures in parsed:
+            listindex.append(file_index)
+            rows.append(row)
+            for msg in failures:
+                self.log.warn(msg)
 
-                # Get classification codes
-                if entry.tag == self.__PRE + 'classification':
-                    # TODO: should this not be findall here?
-                    if 'ISIC' in entry.find(self.__PRE +
-                                            'classificationSystem').text:
-                        PRO.loc[file_index, 'ISIC'] = entry.find(
-                                   self.__PRE + 'classificationValue').text
+        # Build table in one go; property columns follow the label columns
+        PRO = pd.DataFrame.from_records(rows, index=listindex)
 
-                    if 'EcoSpold' in entry.find(
-                                 self.__PRE + 'classificationSystem').text:
+        # Final touches and save to self
+        # Technology levels, looked up by code; unknown codes are kept as is
+        codes = PRO['technologyLevel'].fillna(0).astype(int)
+        PRO['technologyLevel'] = codes.map(
+                dict(enumerate(self.__TechnologyLevels))).fillna(codes)
+        self.PRO = _sort_labels(PRO, self.PRO_order)
 
-                        PRO.loc[file_index, 'EcoSpoldCategory'
-                              ] = entry.find(self.__PRE +
-                                              'classificationValue').text
-                    continue
+    @staticmethod
+    def _parse_PRO_data(sfile, prop_dict):
+        """ Extracts the process labels of a single ecospold file
 
-                # Get geography
-                if entry.tag == self.__PRE + 'geography':
-                    PRO.loc[file_index, 'geography'
-                          ] = entry.find(self.__PRE + 'shortname').text
-                    continue
-
-                # Get Technology
-                try:
-                    if entry.tag == self.__PRE + 'technology':
-                        PRO.loc[file_index, 'technologyLevel'
-                              ] = entry.attrib['technologyLevel']
-                        continue
-                except:
-                    # Apparently it is not a mandatory field in ecospold2.
-                    # Skip if absent
-                    pass
+        Kept free of any object state so that it can run in worker processes
 
+        Args:
+        -----
+        * sfile: path to ecospold dataset file
+        * prop_dict: properties of interest, as self._prop_dict
 
-                # Find MacroEconomic scenario
-                if entry.tag == self.__PRE + 'macroEconomicScenario':
-                    PRO.loc[file_index, 'macroEconomicScenario'
-                          ] = entry.find(self.__PRE + 'name').text
-                    continue
+        Returns:
+        --------
+        * file_index: Id of the process, as used to index PRO
+        * row: dict of labels of the process, as expected by build_PRO()
+        * failures: list of warning messages on inconsistent data
 
-            # To get prices, go through intermediate exchanges
-            interm_exchanges = child_ds.find(self.__PRE + 'flowData').findall(self.__PRE + 'intermediateExchange')
-            for exchange in interm_exchanges:
-                try:
-                    outputgroup = exchange.find(self.__PRE + 'outputGroup').text  # if not output, skip & catch error
-                    # Select only main product for each file
-                    if outputgroup == '0' and exchange.get('intermediateExchangeId') == productId:
-                        props = exchange.findall(self.__PRE + 'property')
-                        for prop in props:
+        """
+        failures = []
+        tag = Ecospold2Matrix.__TAG
+
+        # Elements to read in the file
+        tags = tuple(tag[i] for i in ('activity', 'classification',
+                                      'geography', 'technology',
+                                      'macroEconomicScenario',
+                                      'intermediateExchange'))
+
+        # Remove filename extension
+        if len(os.path.splitext(os.path.basename(sfile))[0].split('_')) == 2:
+            file_index = os.path.splitext(os.path.basename(sfile))[0]
+        elif len(os.path.splitext(os.path.basename(sfile))[0].split('_')) == 3:
+            file_index = os.path.splitext(os.path.basename(sfile))[0].split('_')[1] + '_' + \
+                         os.path.splitext(os.path.basename(sfile))[0].split('_')[2]
+
+        # Record product Id
+        activity_id, productId = file_index.split('_')
+        row = dict.fromkeys(('activityId', 'productId', 'activityName',
+                             'ISIC', 'price', 'priceUnit', 'EcoSpoldCategory',
+                             'geography', 'technologyLevel',
+                             'macroEconomicScenario'), np.nan)
+        row['productId'] = productId  # TODO: this is actually an exchange ID, no?
+
+        # Stream through activity description and intermediate exchanges
+        context = etree.iterparse(sfile, events=('end',), tag=tags,
+                                  **Ecospold2Matrix.__XMLOPTIONS)
+        for _, entry in context:
+
+            # To get prices, go through properties of the main product of
+            # each file, i.e., the intermediate exchange in output group 0
+            if entry.tag == tag['intermediateExchange']:
+                if (entry.findtext(tag['outputGroup']) == '0' and
+                        entry.get('intermediateExchangeId') == productId):
+                    try:
+                        for prop in entry.iterfind(tag['property']):
                             # Go through properties for prices
                             # TODO - There is really no specific reason why this property should be treated separately
-                            if prop.find(self.__PRE + 'name').text == 'price':
-                                price = np.float(prop.get('amount'))
-                                price_unit = prop.find(self.__PRE + 'unitName').text
+                            if prop.find(tag['name']).text == 'price':
+                                price = float(prop.get('amount'))
+                                price_unit = prop.find(tag['unitName']).text
 
                                 # Add new price if initially blank
-                                price_org = PRO.loc[file_index, 'price']
+                                price_org = row['price']
                                 if price_org is np.nan:
-                                    PRO.loc[file_index, ['price', 'priceUnit']] = [price, price_unit]
+                                    row['price'] = price
+                                    row['priceUnit'] = price_unit
                                 # Or complain if price already exists
                                 elif not np.allclose([price_org], [price]):
-                                    print("WARNING: We have heterogeneous prices")
+                                    failures.append("WARNING: We have heterogeneous"
+                                                    " prices in {}".format(sfile))
                                 else:
                                     pass
                             # Get all properties of interest (i.e. defined in PRO_properties)
                             else:
                                 try:
-                                    cx = self._prop_dict[prop.get('propertyId')]
-                                    PRO.loc[file_index, cx] = prop.get('amount')
+                                    cx = prop_dict[prop.get('propertyId')]
+                                    row[cx] = prop.get('amount')
                                 except KeyError:
                                     pass
-                except AttributeError:
+                    except AttributeError:
+                        pass
+
+                    # Activity description comes before the flows: all done,
+                    # no need to parse the rest of the file
+                    break
+                _release(entry)
+                continue
+
+            # Only consider attributes of the activity itself, not of its
+            # exchanges (which also have classifications)
+            if entry.getparent().tag != tag['activityDescription']:
+                continue
+
+            # Get name, id, etc
+            if entry.tag == tag['activity']:
+                row['activityId'] = entry.attrib['id']
+                row['activityName'] = entry.find(tag['activityName']).text
+
+            # Get classification codes
+            elif entry.tag == tag['classification']:
+                # TODO: should this not be findall here?
+                system = entry.find(tag['classificationSystem']).text
+                value = entry.findtext(tag['classificationValue'])
+                if 'ISIC' in system:
+                    row['ISIC'] = value
+
+                if 'EcoSpold' in system:
+                    row['EcoSpoldCategory'] = value
+
+            # Get geography
+            elif entry.tag == tag['geography']:
+                row['geography'] = entry.find(tag['shortname']).text
+
+            # Get Technology
+            elif entry.tag == tag['technology']:
+                # Apparently it is not a mandatory field in ecospold2.
+                # Skip if absent
+                try:
+                    row['technologyLevel'] = entry.attrib['technologyLevel']
+                except KeyError:
                     pass
 
+            # Find MacroEconomic scenario
+            elif entry.tag == tag['macroEconomicScenario']:
+                row['macroEconomicScenario'] = entry.find(tag['name']).text
 
-            # quality check of id and index
-            if file_index.split('_')[0] != PRO.loc[file_index, 'activityId']:
-                self.log.warn('Index based on file {} and activityId in the'
-                              ' xml data are different'.format(str(sfile)))
+            _release(entry)
 
-        # Final touches and save to self
-        PRO['technologyLevel'] = PRO['technologyLevel'].fillna(0).astype(int)
-        for i in self.__TechnologyLevels.index:
-                bo = PRO['technologyLevel'] == i
-                PRO.loc[bo, 'technologyLevel'] = self.__TechnologyLevels[i]
-        self.PRO = PRO.sort_values(by=self.PRO_order)
+        # quality check of id and index
+        if activity_id != row['activityId']:
+            failures.append('Index based on file {} and activityId in the'
+                            ' xml data are different'.format(str(sfile)))
+
+        return file_index, row, failures
 
     def extract_old_labels(self, old_dir, sep='|'):
         """ Read in old PRO, STR and IMP labels csv-files from directory
@@ -1246,28 +1419,25 @@ class Ecospold2Matrix(object):
 
         """
         # Define boolean vector of product flows without source
-        nuns = np.equal(self.inflows['sourceActivityId'].values, None)
+        nuns = self.inflows['sourceActivityId'].isna()
         unsourced_flows = self.inflows[nuns]
 
         # add potentially useful information from other tables
         # (not too crucial)
+        # (inflows index kept as column, to record the fixes later on)
         try:
-            unsourced_flows = self.inflows[nuns].reset_index().merge(
+            unsourced_flows = unsourced_flows.drop(
+                    columns='sourceActivityId').reset_index().merge(
                     self.PRO[['activityName', 'geography', 'activityType']],
-                    left_on='fileId', right_index=True)
-
-            unsourced_flows = unsourced_flows.merge(
+                    left_on='fileId', right_index=True).merge(
                     self.products[['productName', 'productId']],
                     on='productId')
-
-            # ... and remove useless information
-            unsourced_flows.drop(['sourceActivityId'], axis=1, inplace=True)
         except:
             pass
 
         # Log event and save to self
-        if np.any(nuns):
-            self.log.warn('Found {} untraceable flows'.format(np.sum(nuns)))
+        if nuns.any():
+            self.log.warn('Found {} untraceable flows'.format(nuns.sum()))
             self.unsourced_flows = unsourced_flows
         else:
             self.log.info('OK.   No untraceable flows.')
@@ -1300,21 +1470,38 @@ class Ecospold2Matrix(object):
 
         """
 
+        # Columns of PRO against which each flow is compared, and positions
+        # in PRO of the producers of each product and of the markets in each
+        # geography, so that each flow only looks at its candidate sources
+        pro_geo = self.PRO.geography.values
+        pro_actid = self.PRO.activityId.values
+        pro_mark = (self.PRO.activityType == '1').values
+        producers = self.PRO.groupby('productId', sort=False).indices
+        markets = np.flatnonzero(pro_mark)
+        markets = {geo: markets[i] for geo, i in self.PRO.iloc[markets]
+                   .groupby('geography', sort=False).indices.items()}
+        nowhere = np.array([], dtype=np.intp)
+
+        # PRO as plain rows (blank for NaN), for the debug files of ambiguous
+        # flows, only built once such a flow turns up
+        pro_rows = None
+
+        # Sources found for the flows, recorded in inflows in one go
+        fixed_index = []
+        fixed_sources = []
+
         # Proceed to find clear sources for these flows, if at all possible
-        for i in self.unsourced_flows.index:
-            aflow = self.unsourced_flows.irow(i)
-
-            # Boolean vectors for relating the flow under investigation with
-            # PRO, either in term of which industries require the product
-            # in question (boPro), or the geographical location of the flow
-            # (boGeo) or whether a the source activity is a market or an
-            # ordinary activity (boMark), or a compbination of the above
-            boPro = (self.PRO.productId == aflow.productId).values
-            boGeo = (self.PRO.geography == aflow.geography).values
-            boMark = (self.PRO.activityType == '1').values
-            boMarkGeo = np.logical_and(boGeo, boMark)
-            boProGeo = np.logical_and(boPro, boGeo)
-            boProMark = np.logical_and(boPro, boMark)
+        for aflow in self.unsourced_flows.itertuples(index=False):
+
+            # Positions in PRO relating the flow under investigation with
+            # potential sources, either in term of which industries produce
+            # the product in question (iPro), or whether the source activity
+            # is a market in the geographical location of the flow
+            # (iMarkGeo), or a compbination of the above
+            iPro = producers.get(aflow.productId, nowhere)
+            iProGeo = iPro[pro_geo[iPro] == aflow.geography]
+            iProMark = iPro[pro_mark[iPro]]
+            iMarkGeo = markets.get(aflow.geography, nowhere)
 
             act_id = ''   # goal: finding a plausible value for this variable
 
@@ -1322,19 +1509,19 @@ class Ecospold2Matrix(object):
             if aflow.activityType == '0':
 
                 # Maybe there are NO producers, period.
-                if sum(boPro) == 0:
+                if len(iPro) == 0:
                     msg_noprod = "No producer found for product {}! Not good."
                     self.log.error(msg_noprod.format(aflow.productId))
                     self.log.warning("Creation of dummy producer not yet"
                                      " automated")
 
                 # Maybe there is no choice, only ONE producer
-                elif sum(boPro) == 1:
+                elif len(iPro) == 1:
 
-                    act_id = self.PRO[boPro].activityId.values
+                    act_id = pro_actid[iPro[0]]
 
                     # Log event
-                    if any(boProGeo):
+                    if len(iProGeo):
                         # and all is fine geographically for this one producer
                         self.log.warn("Exactly 1 producer ({}) for product {}"
                                       ", and its geography is ok for this"
@@ -1342,7 +1529,7 @@ class Ecospold2Matrix(object):
                                                         aflow.productId))
                     else:
                         # but has wrong geography... geog proxy
-                        wrong_geo = self.PRO[boPro].geography.values
+                        wrong_geo = pro_geo[iPro[0]]
 
                         msg = ("Exactly 1 producer ({}) for product {}, used"
                                " in spite of having wrong geography for {}:{}")
@@ -1354,21 +1541,21 @@ class Ecospold2Matrix(object):
                 # Or there is only ONE producer and ONE market, no choice
                 # either, since then it is clear that this producer sells to
                 # the market.
-                elif sum(boPro) == 2 and sum(boProMark) == 1:
+                elif len(iPro) == 2 and len(iProMark) == 1:
 
-                    act_id = self.PRO[boProMark].activityId.values
+                    act_id = pro_actid[iProMark[0]]
 
                     # Log event
-                    self.log.warn = ("Exactly 1 producer and 1 market"
-                                     " worldwide, so we source product {} from"
-                                     " market {}".format(aflow.productId,
-                                                         act_id))
+                    self.log.warn("Exactly 1 producer and 1 market"
+                                  " worldwide, so we source product {} from"
+                                  " market {}".format(aflow.productId,
+                                                      act_id))
 
                 # or there are multiple sources, but only one market with the
                 # right geography
-                elif sum(boMarkGeo) == 1:
+                elif len(iMarkGeo) == 1:
 
-                    act_id = self.PRO[boMarkGeo].activityId.values
+                    act_id = pro_actid[iMarkGeo[0]]
 
                     # Log event
                     msg_markGeo = ('Multiple sources, but only one market ({})'
@@ -1381,9 +1568,9 @@ class Ecospold2Matrix(object):
 
                 # Or there are multiple sources, but only one producer with the
                 # right geography.
-                elif sum(boProGeo) == 1:
+                elif len(iProGeo) == 1:
 
-                    act_id = self.PRO[boProGeo].activityId.values
+                    act_id = pro_actid[iProGeo[0]]
 
                     # Log event
                     msg_markGeo = ('Multiple sources, but only one producer'
@@ -1405,17 +1592,28 @@ class Ecospold2Matrix(object):
                     msg = ("No unambiguous fix. {} potential sources for "
                            "product {} use by {}. Will need manual fix, see"
                            " {}.")
-                    self.log.error(msg.format(sum(boPro),
+                    self.log.error(msg.format(len(iPro),
                                               aflow.productId,
                                               aflow.fileId,
                                               debug_file))
 
-                    self.PRO.loc[boPro, :].to_csv(debug_file, sep='|',
-                                                 encoding='utf-8')
+                    if pro_rows is None:
+                        pro_header = ([self.PRO.index.name or '']
+                                      + list(self.PRO.columns))
+                        pro_rows = self.PRO.astype(object).where(
+                                self.PRO.notna(), '')
+                        pro_rows = pro_rows.reset_index().values.tolist()
+
+                    with open(debug_file, 'w', newline='',
+                              encoding='utf-8') as fout:
+                        debugwriter = csv.writer(fout, delimiter='|')
+                        debugwriter.writerow(pro_header)
+                        debugwriter.writerows(pro_rows[i] for i in iPro)
 
                 # Based on choice of act_id, record the selected source
                 # activity in inflows
-                self.inflows.loc[aflow['index'], 'sourceActivityId'] = act_id
+                fixed_index.append(aflow.index)
+                fixed_sources.append(act_id)
 
             elif aflow.activityType == '1':
                 msg = ("A market with untraceable inputs:{}. This is not yet"
@@ -1428,6 +1626,8 @@ class Ecospold2Matrix(object):
                        " product {}").format(aflow.fileId, aflow.productId)
                 self.log.error(msg)  # do something!
 
+        self.inflows.loc[fixed_index, 'sourceActivityId'] = fixed_sources
+
     def __fix_missing_activities(self):
         """ Fix if flow sourced explicitly to an activity that does not exist
         Identifies existence of missing production, and generate them
@@ -1446,31 +1646,32 @@ class Ecospold2Matrix(object):
 
         """
 
-        # Get set of all producer-product pairs in inflows
-        flows = self.inflows[['sourceActivityId', 'productId']].values.tolist()
-        set_flows = set([tuple(i) for i in flows])
-
-        # Set of all producer-product pairs in PRO
-        processes = self.PRO[['activityId', 'productId']].values.tolist()
-        set_labels = set([tuple(i) for i in processes])
+        # Get all producer-product pairs in inflows
+        flows = self.inflows[['sourceActivityId', 'productId']
+                             ].dropna().drop_duplicates()
 
-        # Identify discrepencies: missing producer-product pairs in labels
-        missing_activities = set_flows - set_labels
+        # Identify discrepencies: missing producer-product pairs in labels,
+        # i.e., pairs of inflows without match in PRO
+        flows = flows.merge(self.PRO[['activityId', 'productId']],
+                            how='left',
+                            left_on=['sourceActivityId', 'productId'],
+                            right_on=['activityId', 'productId'],
+                            indicator=True)
+        missing = flows.loc[flows['_merge'] == 'left_only',
+                            ['sourceActivityId', 'productId']]
 
-        if missing_activities:
+        if len(missing):
 
             # Complain
             msg = ("Found {} product flows traceable to sources that do not"
                    " produce right product. Productions will have to be added"
                    " to PRO, which now contain {} productions. Please see"
                    " missingProducers.csv.")
-            self.log.error(msg.format(len(missing_activities), len(self.PRO)))
+            self.log.error(msg.format(len(missing), len(self.PRO)))
 
             # Organize in dataframe
-            miss = pd.DataFrame([[i[0], i[1]] for i in missing_activities],
-                                columns=['activityId', 'productId'],
-                                index=[i[0] + '_' + i[1]
-                                       for i in missing_activities])
+            miss = missing.rename(columns={'sourceActivityId': 'activityId'})
+            miss.index = miss['activityId'] + '_' + miss['productId']
             activity_cols = ['activityId', 'activityName', 'ISIC']
             product_cols = ['productId', 'productName']
             copied_cols = activity_cols + product_cols
@@ -1490,22 +1691,26 @@ class Ecospold2Matrix(object):
                         sep='|', encoding='utf-8')
 
             # Insert dummy productions
-            for i, row in miss.iterrows():
+            for i in miss.index:
                 self.log.warn('New dummy activity: {}'.format(i))
 
+            # add rows to self.PRO
+            new_pro = miss[copied_cols].copy()
+            new_pro['comment'] = 'DUMMY PRODUCTION'
+            self.PRO = pd.concat([self.PRO, new_pro])
 
-                # add row to self.PRO
-                self.PRO.loc[i, copied_cols] = row[copied_cols]
-                self.PRO.loc[i, 'comment'] = 'DUMMY PRODUCTION'
-
-                # add new row in outputflow
-                self.outflows.loc[i, ['fileId', 'productId', 'amount']
-                                ] = [i, row['productId'], 1.0]
+            # add new rows in outputflow
+            new_out = pd.DataFrame({'fileId': miss.index,
+                                    'productId': miss['productId'],
+                                    'amount': 1.0},
+                                   index=miss.index)
+            self.outflows = pd.concat([self.outflows, new_out])
 
             self.log.warn("Added dummy productions to PRO, which"
                           " is now {} processes long.".format(len(self.PRO)))
 
-            self.missing_activities = missing_activities
+            self.missing_activities = set(zip(miss['activityId'],
+                                              miss['productId']))
 
         else:
             self.log.info("OK. Source activities seem in order. Each product"
@@ -1591,9 +1796,17 @@ class Ecospold2Matrix(object):
         # Final touches and re-establish indexes as before
         self.PRO = self.PRO.drop('unitId', axis=1).set_index('index')
 
+        # Store highly repetitive label columns as categories: less memory,
+        # and sorts, groupbys and merges on integer codes
+        for col in ('comp', 'subcomp', 'unitName', 'ISIC'):
+            if col in self.PRO.columns:
+                self.PRO[col] = self.PRO[col].astype('category')
+            if col in self.STR.columns:
+                self.STR[col] = self.STR[col].astype('category')
+
         # Re-sort processes (in fix-methods altered order/inserted rows)
-        self.PRO = self.PRO.sort_values(by=self.PRO_order)
-        self.STR = self.STR.sort_values(by=self.STR_order)
+        self.PRO = _sort_labels(self.PRO, self.PRO_order)
+        self.STR = _sort_labels(self.STR, self.STR_order)
 
     def build_AF(self):
         """
@@ -1622,26 +1835,20 @@ class Ecospold2Matrix(object):
 
         """
 
-        # By pivot tables, arrange all intermediate and elementary flows as
-        # matrices
+        # Arrange all intermediate and elementary flows as sparse matrices,
+        # straight from their coordinates rather than through dense pivots
         self.log.info("Starting to assemble the matrices")
-        self.inflows['row_index'] = self.inflows['sourceActivityId'] + '_' + self.inflows['productId']
-        self.A = self.inflows.pivot(index='row_index', columns='fileId', values='amount').reindex(
-                index=self.PRO.index, columns=self.PRO.index)
-
-        self.F = pd.pivot_table(self.elementary_flows,
-                           values='amount',
-                           index='elementaryExchangeId',
-                           columns='fileId').reindex(index=self.STR.index, columns=self.PRO.index)
-
-        if self.nan2null:
-            self.log.info("fillna")
-            self.A.fillna(0, inplace=True)
-            self.F.fillna(0, inplace=True)
-
-        # Compress
-        self.A = self.A.astype(self.sformat)
-        self.F = self.F.astype(self.sformat)
+        A = self.__sparse_pivot(self.inflows,
+                                self.inflows['sourceActivityId'] + '_' +
+                                self.inflows['productId'],
+                                self.PRO.index)
+        F = self.__sparse_pivot(self.elementary_flows,
+                                self.elementary_flows['elementaryExchangeId'],
+                                self.STR.index,
+                                aggregate=True)
+
+        # Reference output of each process, in the order of the labels
+        amount = self.outflows['amount'].reindex(self.PRO.index).values
 
         self.log.info("Starting normalizing matrices")
         if self.positive_waste:
@@ -1649,51 +1856,130 @@ class Ecospold2Matrix(object):
             #   This approach changes the sign of explicit waste flows (defined
             #   with a negative output), while preserving other negative signs
             #   (substitution, etc.)
-            sign_changer = self.outflows['amount'] / self.outflows['amount'].abs()
-            bo_waste = sign_changer < 0.0
+            bo_waste = amount < 0.0
 
             # Change sign of A-matrix rows where exchange is waste
             # Reflect this in labels
-            self.A = self.A.mul(sign_changer, axis=0)
-            col_normalizer = 1 / self.outflows['amount'].abs()
+            A = scipy.sparse.diags(np.sign(amount)) @ A
+            col_normalizer = 1 / np.abs(amount)
             self.PRO.loc[bo_waste, 'productName'] = "[treatment for] " + self.PRO.loc[bo_waste, 'productName']
         else:
-            col_normalizer = 1 / self.outflows['amount']
-
+            col_normalizer = 1 / amount
 
-        # Normalize columns (technology descriptions)
-        # Reorder all rows and columns to fit labels
-        #
-        # TODO: I think we are duplicating it with the reindex
-        self.A = self.A.mul(col_normalizer, axis=1).reindex(
-                                                        index=self.PRO.index,
-                                                        columns=self.PRO.index)
-        self.F = self.F.mul(col_normalizer, axis=1).reindex(
-                                                        index=self.STR.index,
-                                                        columns=self.PRO.index)
+        # Normalize columns (technology descriptions), still in sparse
+        # scipy format
+        normalizer = scipy.sparse.diags(col_normalizer)
+        A = (A @ normalizer).tocsr()
+        F = F @ normalizer
 
+        # Sign adjustments only touch the stored flows (A.data), never the
+        # full matrix
         if self.positive_waste:
             # In cutoff version of ecoinvent, some dummy waste processes do
             # _not_ seem to have negative reference outputs. These must then be
             # identified more crudely based on string recognition, and their
             # rows forced positive in the A-matrix
-            bo_cutoff = self.PRO.activityName.str.contains(self.__CUTOFFTXT)
-            # quick return to dense to be able to use indexes
-            self.A = self.A.sparse.to_dense()
-            self.A.loc[bo_cutoff,:] = self.A.loc[bo_cutoff,:].abs()
-            # compress again
-            self.A = self.A.astype(self.sformat)
+            bo_cutoff = self.PRO.activityName.str.contains(self.__CUTOFFTXT,
+                                                           na=False).values
+            # whether each stored flow (in csr order) lies in a cutoff row
+            bo_flows = np.repeat(bo_cutoff, np.diff(A.indptr))
+            A.data[bo_flows] = np.abs(A.data[bo_flows])
 
         if self.force_all_positive:
             # More foreceful postprocessing, e.g., if suspicious negative flows
             # in cutoff ecoinvent
-            nb_neg = (self.A < 0.0).sum().sum()
+            nb_neg = (A.data < 0.0).sum()
             if nb_neg:
-                self.A = self.A.abs()
+                A.data = np.abs(A.data)
                 self.log.warning("The A-matrix contained {} negative flows. All "
                                  "made positive now".format(nb_neg))
                 # TODO: log which negative flows turned positive
 
+        # Only then label rows and columns
+        self.A = self.__label_sparse(A, self.PRO.index)
+        self.F = self.__label_sparse(F, self.STR.index)
+
+    def __sparse_pivot(self, flows, keys, rows, aggregate=False):
+        """ Arranges flows as a sparse matrix of rows x self.PRO.index
+
+        Same values as pivoting flows (with pivot, or pivot_table if
+        aggregate) and reindexing on the labels, but assembled from the
+        coordinates of the flows without ever allocating a dense matrix.
+
+        Args:
+        -----
+        * flows:     DataFrame of flows, with columns fileId and amount
+        * keys:      Series identifying the row of each flow
+        * rows:      labels of the rows of the matrix
+        * aggregate: average duplicate flows, as pivot_table would; if False,
+                     duplicates raise a ValueError, as pivot would
+
+        Returns:
+        --------
+        * scipy.sparse.csc_matrix
+
+        """
+        pairs = [keys.values, flows['fileId'].values]
+        amounts = flows['amount'].values
+        if aggregate:
+            amounts = flows['amount'].groupby(pairs, sort=False).mean()
+            pairs = amounts.index
+            amounts = amounts.values
+        else:
+            pairs = pd.MultiIndex.from_arrays(pairs)
+            if pairs.has_duplicates:
+                raise ValueError("Index contains duplicate entries, cannot"
+                                 " reshape")
+
+        # Positions of flows in matrix, ignoring flows without a label
+        i = rows.get_indexer(pairs.get_level_values(0))
+        j = self.PRO.index.get_indexer(pairs.get_level_values(1))
+        bo = (i >= 0) & (j >= 0)
+
+        return scipy.sparse.csc_matrix(
+                (amounts[bo], (i[bo], j[bo])),
+                shape=(len(rows), len(self.PRO.index)))
+
+    def __label_sparse(self, mat, rows):
+        """ Labels a scipy sparse matrix of rows x self.PRO.index
+
+        Args:
+        -----
+        * mat:  scipy sparse matrix
+        * rows: labels of the rows of the matrix
+
+        Returns:
+        --------
+        * DataFrame of sparse format self.sformat; absent flows take the fill
+          value of this format (0 or NaN)
+
+        """
+        df = pd.DataFrame.sparse.from_spmatrix(mat, index=rows,
+                                               columns=self.PRO.index)
+        return df.astype(self.sformat)
+
+    @staticmethod
+    def __to_csc(df):
+        """ Converts a labelled DataFrame to a scipy csc matrix
+
+        Sparse DataFrames are converted from their coordinates, without
+        densifying them; missing values are treated as zeros.
+
+        Args:
+        -----
+        * df: DataFrame, sparse or dense
+
+        Returns:
+        --------
+        * scipy.sparse.csc_matrix
+
+        """
+        try:
+            return scipy.sparse.csc_matrix(df.sparse.to_coo())
+        except AttributeError:
+            # Single column-major copy, with NaN already filled
+            arr = df.to_numpy(dtype=np.float64, na_value=0.0)
+            return scipy.sparse.csc_matrix(np.asfortranarray(arr))
 
     def scale_up_AF(self):
         """ Calculate absolute flow matrix from A, F, and production Volumes
@@ -1715,10 +2001,11 @@ class Ecospold2Matrix(object):
 
         """
         # TODO: Do we need to worry about negative signs of waste here?
-        q = self.outflows['productionVolume']
+        # Align once on the columns, so products keep the labels of A and F
+        q = self.outflows['productionVolume'].reindex(self.A.columns)
 
-        self.Z = self.A.multiply(q, axis=1).reindex_like(self.A)
-        self.G_pro = self.F.multiply(q, axis=1).reindex_like(self.F)
+        self.Z = self.A.multiply(q, axis=1)
+        self.G_pro = self.F.multiply(q, axis=1)
 
     def build_sut(self, make_untraceable=False):
         """ Arranges flow data as Suply and Use Tables and extensions
@@ -1753,12 +2040,17 @@ class Ecospold2Matrix(object):
 
         """
 
+        product_part = re.compile(r'_[^_]*$')
+
         def remove_productId_from_fileId(flows):
             """subfunction to remove the 'product_Id' part of 'fileId' data in
             DataFrame, leaving only activityId and renaming columnd as such"""
 
-            fls = flows.replace('_[^_]*$', '', regex=True)
-            fls.rename(columns={'fileId': 'activityId'}, inplace=True)
+            # Only the fileId column carries a product part, no need to scan
+            # every cell of the frame
+            fls = flows.rename(columns={'fileId': 'activityId'})
+            fls['activityId'] = fls['activityId'].str.replace(product_part, '',
+                                                              regex=True)
             return fls
 
         # Refocus on activity rather than process (activityId vs fileId)
@@ -1768,12 +2060,11 @@ class Ecospold2Matrix(object):
         infls.replace(to_replace=[None], value='', inplace=True)
 
 
-        # Pivot flows into Use and Supply and extension tables
-        self.U = pd.pivot_table(infls,
-                                index=['sourceActivityId', 'productId'],
-                                columns='activityId',
-                                values='amount',
-                                aggfunc=np.sum).reindex(columns=self.activities.index)
+        # Pivot flows into Use and Supply and extension tables, each with a
+        # single groupby-sum over the flows
+        self.U = infls.groupby(['sourceActivityId', 'productId', 'activityId']
+                               )['amount'].sum().unstack('activityId'
+                               ).reindex(columns=self.activities.index)
         if self.nan2null:
             self.U.fillna(0, inplace=True)
 
@@ -1789,28 +2080,28 @@ class Ecospold2Matrix(object):
         self.U = self.U.astype(self.sformat)
 
 
-        self.V = pd.pivot_table(outfls, index='productId', columns='activityId', values='amount', aggfunc=np.sum
-                ).reindex(index=self.products.index, columns=self.activities.index)
+        # Supply amounts and production volumes, aggregated together
+        supply = outfls.groupby(['productId', 'activityId'])[
+                ['amount', 'productionVolume']].sum()
+
+        self.V = supply['amount'].unstack('activityId').reindex(
+                index=self.products.index, columns=self.activities.index)
         if self.nan2null:
             self.V.fillna(0, inplace=True)
         self.V = self.V.astype(self.sformat)
 
-        self.V_prodVol = pd.pivot_table(outfls,
-                                        index='productId',
-                                        columns='activityId',
-                                        values='productionVolume',
-                                        aggfunc=np.sum).reindex(index=self.products.index,
-                                                                columns=self.activities.index)
+        self.V_prodVol = supply['productionVolume'].unstack('activityId'
+                ).reindex(index=self.products.index,
+                          columns=self.activities.index)
 
         if self.nan2null:
             self.V_prodVol.fillna(0, inplace=True)
         self.V_prodVol = self.V_prodVol.astype(self.sformat)
 
-        self.G_act = pd.pivot_table(elfls,
-                                    index='elementaryExchangeId',
-                                    columns='activityId',
-                                    values='amount',
-                                    aggfunc=np.sum).reindex(index=self.STR.index, columns=self.activities.index)
+        self.G_act = elfls.groupby(['elementaryExchangeId', 'activityId']
+                                   )['amount'].sum().unstack('activityId'
+                                   ).reindex(index=self.STR.index,
+                                             columns=self.activities.index)
         if self.nan2null:
             self.G_act.fillna(0, inplace=True)
         self.G_act = self.G_act
@@ -1844,7 +2135,7 @@ class Ecospold2Matrix(object):
         # Get list of ecospold files
         if data_folder is None:
             data_folder = self.lci_dir
-        spold_files = glob.glob(os.path.join(data_folder, '*.spold'))
+        spold_files = self.__list_spold_files(data_folder)
 
         if len(spold_files):
             self.log.info( "Processing {} {} files from {}".format(
@@ -1853,43 +2144,92 @@ class Ecospold2Matrix(object):
             self.log.warning(
                     "Did not find any ecospold file in {}".format(data_folder))
 
-        # Initialize (huge) dataframe and get dimensions
+        # Get initial dimensions; exchanges collected in long form, as compact
+        # typed arrays of stressor code, file code and amount. Each Id is
+        # stored once, coded in order of appearance
+        initial_rows, initial_columns = len(self.STR), len(self.PRO)
+        stressor_codes = dict()
+        file_codes = dict()
+        stressors_long = array.array('q')
+        files_long = array.array('q')
+        amounts = array.array('d')
+
+        # If pickles are preferred, reuse the extractions of previous runs,
+        # cached under the SHA-1 of each file: any edit triggers a new parse
+        cache = dict()
+        cached = dict()
+        if self.prefer_pickles:
+            cache_dir = os.path.join(self.out_dir, 'spold_cache')
+            os.makedirs(cache_dir, exist_ok=True)
+            for sfile in spold_files:
+                cache[sfile] = os.path.join(cache_dir,
+                                            self.__hash_file(sfile) + '.pickle')
+                if os.path.exists(cache[sfile]):
+                    with open(cache[sfile], 'rb') as f:
+                        cached[sfile] = pickle.load(f)
+            self.log.info('{} files loaded from {}'.format(len(cached),
+                                                           cache_dir))
+        to_parse = [i for i in spold_files if i not in cached]
+
+        # LOOP OVER ALL FILES TO EXTRACT ELEMENTARY FLOWS, collecting each
+        # file as soon as it is parsed
+        def collect(parsed):
+            for count, sfile in enumerate(spold_files):
+                try:
+                    data = cached[sfile]
+                except KeyError:
+                    data = next(parsed)
+                    if sfile in cache:
+                        with open(cache[sfile], 'wb') as f:
+                            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+                # File Id from actual file name, whatever the cached one
+                _, stressors, values, failures = data
+                current_id = os.path.splitext(os.path.basename(sfile))[0]
+                if len(stressors):
+                    code = file_codes.setdefault(current_id, len(file_codes))
+                    files_long.extend([code] * len(stressors))
+                    stressors_long.extend(
+                            stressor_codes.setdefault(sid, len(stressor_codes))
+                            for sid in stressors)
+                    amounts.extend(values)
+                for msg in failures:
+                    self.log.warn(msg)
+
+                # keep user posted, as this loop can be quite long
+                if count % 300 == 0:
+                    self.log.info('Completed {} files.'.format(count))
+
+        # files spread over worker processes
+        if self.max_workers == 1:
+            collect(map(self._parse_lci_data, to_parse))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    self.max_workers) as pool:
+                collect(pool.map(self._parse_lci_data, to_parse,
+                                 chunksize=64))
+
+        # Fill (huge) dataframe in one go, straight from the codes, the last
+        # amount of any repeated exchange prevailing. Stressors and processes
+        # missing from labels are appended in order of appearance
         self.log.info('creating E dataframe')
-        self.E = pd.DataFrame(index=self.STR.index,
-                                columns=self.PRO.index, dtype=float)
-        initial_rows, initial_columns = self.E.shape
-
-        # LOOP OVER ALL FILES TO EXTRACT ELEMENTARY FLOWS
-        for count, sfile in enumerate(spold_files):
-
-            # Get to flow data
-            current_file = os.path.basename(sfile)
-            current_id = os.path.splitext(current_file)[0]
-            root = ET.parse(sfile).getroot()
-            child_ds = root.find(self.__PRE + 'childActivityDataset')
-            if child_ds is None:
-                child_ds = root.find(self.__PRE + 'activityDataset')
-            flow_ds = child_ds.find(self.__PRE + 'flowData')
-
-            # Find elemementary exchanges amongst all flows
-            for entry in flow_ds:
-                if entry.tag == self.__PRE + 'elementaryExchange':
-                    try:
-                        # Get amount
-                        self.E.loc[entry.attrib['elementaryExchangeId'],
-                                    current_id] = float(entry.attrib['amount'])
-                    except:
-                        _amount = entry.attrib.get('amount', 'not found')
-                        if _amount != '0':
-                            msg = ("Parser warning: elementary exchange in {0}"
-                                   ". elementaryExchangeId: {1} - amount: {2}")
-                            self.log.warn(msg.format(str(current_file),
-                                    entry.attrib.get('elementaryExchangeId',
-                                                     'not found'), _amount))
-
-            # keep user posted, as this loop can be quite long
-            if count % 300 == 0:
-                self.log.info('Completed {} files.'.format(count))
+        stressor_ids = pd.Index(list(stressor_codes))
+        file_ids = pd.Index(list(file_codes))
+        rows = self.STR.index.append(
+                stressor_ids.difference(self.STR.index, sort=False)
+                ).rename(self.STR.index.name)
+        columns = self.PRO.index.append(
+                file_ids.difference(self.PRO.index, sort=False)
+                ).rename(self.PRO.index.name)
+
+        i = rows.get_indexer(stressor_ids)[np.frombuffer(stressors_long,
+                                                         dtype=np.int64)]
+        j = columns.get_indexer(file_ids)[np.frombuffer(files_long,
+                                                        dtype=np.int64)]
+        last = ~pd.Series(i * len(columns) + j).duplicated(keep='last').values
+        E = np.full((len(rows), len(columns)), np.nan, dtype=self.format)
+        E[i[last], j[last]] = np.frombuffer(amounts)[last]
+        self.E = pd.DataFrame(E, index=rows, columns=columns)
 
         # Check for discrepancies in list of stressors and processes
         final_rows, final_columns = self.E.shape
@@ -1907,6 +2247,53 @@ class Ecospold2Matrix(object):
         if self.nan2null:
             self.E.fillna(0, inplace=True)
 
+    @staticmethod
+    def _parse_lci_data(sfile):
+        """ Extracts the elementary exchanges of a single cummulative LCI file
+
+        Kept free of any object state so that it can run in worker processes
+
+        Args:
+        -----
+        * sfile: path to ecospold dataset file
+
+        Returns:
+        --------
+        * current_id: Id of the dataset, from its file name
+        * stressor_ids, amounts: lists of elementary exchanges, as expected by
+                                 build_E()
+        * failures: list of warning messages for unparsable exchanges
+
+        """
+        stressor_ids = []
+        amounts = []
+        failures = []
+
+        current_file = os.path.basename(sfile)
+        current_id = os.path.splitext(current_file)[0]
+
+        # Stream through elemementary exchanges only
+        for _, entry in etree.iterparse(
+                sfile, events=('end',),
+                tag=Ecospold2Matrix.__TAG['elementaryExchange'],
+                **Ecospold2Matrix.__XMLOPTIONS):
+            try:
+                # Get amount
+                amount = float(entry.attrib['amount'])
+                stressor_ids.append(entry.attrib['elementaryExchangeId'])
+                amounts.append(amount)
+            except:
+                _amount = entry.attrib.get('amount', 'not found')
+                if _amount != '0':
+                    msg = ("Parser warning: elementary exchange in {0}"
+                           ". elementaryExchangeId: {1} - amount: {2}")
+                    failures.append(msg.format(str(current_file),
+                            entry.attrib.get('elementaryExchangeId',
+                                             'not found'), _amount))
+            _release(entry)
+
+        return current_id, stressor_ids, amounts, failures
+
     def __calculate_E(self, A0, F0):
         """ Calculate lifecycle cummulative inventories for comparison self.E
 
@@ -1915,6 +2302,13 @@ class Ecospold2Matrix(object):
         * A0 : Leontief A-matrix (pandas dataframe)
         * F0 : Environmental extension (pandas dataframe)
 
+        Behaviour determined by:
+        ------------------------
+        * prefer_pickles: Whether or not to load the result of a previous
+                          calculation on the same A0 and F0 (pickled in
+                          out_dir/Ec_cache under their SHA-1), and pickle that
+                          of a new one for the next run
+
         Returns:
         --------
         * Ec as pandas dataframe
@@ -1924,11 +2318,36 @@ class Ecospold2Matrix(object):
         * Plan to move this as nested function of cummulative_lci_check
 
         """
-        A = A0.fillna(0).values
-        F = F0.fillna(0).values
-        I = np.eye(len(A))
-        Ec = F.dot(np.linalg.solve(I - A, I))
-        return pd.DataFrame(Ec, index=F0.index, columns=A0.columns)
+        A = self.__to_csc(A0)
+        F = self.__to_csc(F0)
+
+        # Identify the system by its stored coefficients and labels
+        if self.prefer_pickles:
+            sha1 = hashlib.sha1()
+            for mat in (A, F):
+                for arr in (mat.data, mat.indices, mat.indptr):
+                    sha1.update(np.ascontiguousarray(arr).tobytes())
+            for labels in (F0.index, A0.columns):
+                sha1.update('\n'.join(map(str, labels)).encode())
+            cache_dir = os.path.join(self.out_dir, 'Ec_cache')
+            os.makedirs(cache_dir, exist_ok=True)
+            filename = os.path.join(cache_dir, sha1.hexdigest() + '.pickle')
+            if os.path.exists(filename):
+                with open(filename, 'rb', self.__PICKLEBUFFER) as f:
+                    Ec = pickle.load(f)
+                self.log.info("Calculated LCI loaded from {}".format(filename))
+                return Ec
+
+        # Ec = F (I-A)^-1, solved as (I-A)^T Ec^T = F^T without inverting
+        I = scipy.sparse.identity(A.shape[0], format='csc')
+        lu = scipy.sparse.linalg.splu((I - A).tocsc())
+        Ec = lu.solve(F.T.toarray(), trans='T').T
+        Ec = pd.DataFrame(Ec, index=F0.index, columns=A0.columns)
+
+        if self.prefer_pickles:
+            with open(filename, 'wb', self.__PICKLEBUFFER) as f:
+                pickle.dump(Ec, f, pickle.HIGHEST_PROTOCOL)
+        return Ec
 
 
     def cummulative_lci_check(self, rtol=5e-2, atol=1e-5, imax=3):
@@ -1983,8 +2402,21 @@ class Ecospold2Matrix(object):
 
         thebad = None
 
+        # Values are compared by position, so labels must match
+        if not (self.E.index.equals(Ec.index)
+                and self.E.columns.equals(Ec.columns)):
+            raise ValueError("Official and calculated cummulative LCI do not"
+                             " share the same labels, cannot compare")
+
         # Compare the two matrices, see how many values are "close"
-        close = np.isclose(abs(self.E.fillna(0.0)), abs(Ec.fillna(0.0)), rtol, atol)
+        # (absolute values, with missing values as zeros, in single copies)
+        official = self.E.to_numpy(dtype=np.float64, copy=True,
+                                   na_value=0.0)
+        calculated = Ec.to_numpy(dtype=np.float64, copy=True,
+                                 na_value=0.0)
+        close = np.isclose(np.abs(official, out=official),
+                           np.abs(calculated, out=calculated), rtol, atol)
+        del official, calculated
         notclose = np.sum(~ close)
         allcomp = np.sum(close) + notclose
         self.log.info('There are {} lifecycle cummulative emissions out of {} that '
@@ -1994,23 +2426,19 @@ class Ecospold2Matrix(object):
                                                                rtol*100,
                                                                atol))
         if notclose:
-            # Compile a Series of all "not-close" values
-            thebad = pd.concat([self.E.mask(close).stack(), Ec.mask(close).stack()], 1)
+            # Gather all "not-close" values directly from the two matrices
+            i, j = np.where(~close)
+            thebad = pd.DataFrame({'stressId': self.E.index[i],
+                                   'fileId': self.E.columns[j],
+                                   'official': self.E.values[i, j],
+                                   'calculated': Ec.values[i, j]})
             del(Ec)
-            thebad.columns = ['official', 'calculated']
-            thebad.index.names = ['stressId', 'fileId']
-
-            # Merge labels to make it human readable
-            thebad = pd.merge(thebad.reset_index(),
-                              self.PRO[['productName', 'activityName']],
-                              left_on='fileId',
-                              right_index=True)
 
-            thebad = pd.merge(thebad,
-                              self.STR,
-                              left_on='stressId',
-                              right_index=True).set_index(['stressId',
-                                                                  'fileId'])
+            # Join labels to make it human readable
+            thebad = thebad.join(self.PRO[['productName', 'activityName']],
+                                 on='fileId', how='inner')
+            thebad = thebad.join(self.STR, on='stressId', how='inner'
+                                 ).set_index(['stressId', 'fileId'])
 
         return thebad
 
@@ -2076,8 +2504,10 @@ class Ecospold2Matrix(object):
 
             # save dictionary as pickle
             ext = '.gz.pickle'
-            with gzip.open(filename + ext, 'wb') as fout:
-                pickle.dump(adict, fout)
+            with open(filename + ext, 'wb', self.__PICKLEBUFFER) as fraw, \
+                    gzip.GzipFile(fileobj=fraw, mode='wb',
+                                  compresslevel=self.__GZIPLEVEL) as fout:
+                pickle.dump(adict, fout, pickle.HIGHEST_PROTOCOL)
             sha1 = self.__hash_file(filename + ext)
             msg = "{} saved in {} with SHA-1 of {}"
             self.log.info(msg.format(what_it_is, filename + ext, sha1))
@@ -2193,34 +2623,34 @@ class Ecospold2Matrix(object):
 
             file_pr = os.path.join(self.out_dir,
                                    self.project_name + format_name)
-            PRO = self.PRO.fillna('').values
-            STR = self.STR.fillna('').values
+            PRO = self.PRO.astype(object).fillna('').values
+            STR = self.STR.astype(object).fillna('').values
             IMP = self.IMP.fillna('').values
             PRO_header = self.PRO.columns.values
             PRO_header = PRO_header.reshape((1, -1))
             STR_header = self.STR.columns.values
             STR_header = STR_header.reshape((1, -1))
 
-            C = scipy.sparse.csc_matrix(self.C.sparse.to_coo())
+            C = self.__to_csc(self.C)
             IMP_header = self.IMP.columns.values
             IMP_header = IMP_header.reshape((1, -1))
 
             if self.A is not None:
-                A = scipy.sparse.csc_matrix(self.A.sparse.to_coo())
-                F = scipy.sparse.csc_matrix(self.F.sparse.to_coo())
+                A = self.__to_csc(self.A)
+                F = self.__to_csc(self.F)
                 pickle_symm_norm(PRO=PRO, STR=STR, IMP=IMP, A=A, F=F, C=C,
                         PRO_header=PRO_header, STR_header=STR_header,
                         IMP_header=IMP_header, mat=True,
                         for_arda_background=for_arda_background)
             if self.Z is not None:
-                Z = scipy.sparse.csc_matrix(self.Z.sparse.to_coo())
-                G_pro = scipy.sparse.csc_matrix(self.G_pro.sparse.to_coo())
+                Z = self.__to_csc(self.Z)
+                G_pro = self.__to_csc(self.G_pro)
                 pickle_symm_scaled(PRO, STR, Z, G_pro, mat=True)
             if self.U is not None:
-                U = scipy.sparse.csc_matrix(self.U.fillna(0))
-                V = scipy.sparse.csc_matrix(self.V.fillna(0))
-                V_prodVol = scipy.sparse.csc_matrix(self.V_prodVol.fillna(0))
-                G_act = scipy.sparse.csc_matrix(self.G_act.fillna(0))
+                U = self.__to_csc(self.U)
+                V = self.__to_csc(self.V)
+                V_prodVol = self.__to_csc(self.V_prodVol)
+                G_act = self.__to_csc(self.G_act)
                 products = self.products.values  # to numpy array, not sparse
                 activities = self.activities.values
                 pickle_sut(products,
@@ -2239,28 +2669,30 @@ class Ecospold2Matrix(object):
             with open(os.path.join(csv_dir, 'processingdata.csv'), 'w+') as f:
                 w = csv.writer(f)
                 w.writerows(processingdata.items())
-            # write the actual data
-            self.PRO.to_csv(os.path.join(csv_dir, 'PRO.csv'))
-            self.STR.to_csv(os.path.join(csv_dir, 'STR.csv'))
+            # write the actual data, each table to its own file
+            tables = {'PRO': self.PRO, 'STR': self.STR}
             if self.C is not None:
-                self.C.to_csv(os.path.join(csv_dir, 'C.csv'), sep='|')
-                self.IMP.to_csv(os.path.join(csv_dir, 'IMP.csv'), sep='|')
+                tables.update(C=self.C, IMP=self.IMP)
             if self.A is not None:
-                self.A.to_csv(os.path.join(csv_dir, 'A.csv'), sep='|')
-                self.F.to_csv(os.path.join(csv_dir, 'F.csv'), sep='|')
+                tables.update(A=self.A, F=self.F)
             if self.Z is not None:
-                self.Z.to_csv(os.path.join(csv_dir, 'Z.csv'), sep='|')
-                self.G_pro.to_csv(os.path.join(csv_dir, 'G_pro.csv'), sep='|')
+                tables.update(Z=self.Z, G_pro=self.G_pro)
             if self.U is not None:
-                self.products.to_csv(os.path.join(csv_dir, 'products.csv'),
-                                     sep='|')
-                self.activities.to_csv(os.path.join(csv_dir, 'activities.csv'),
-                                       sep='|')
-                self.U.to_csv(os.path.join(csv_dir, 'U.csv'), sep='|')
-                self.V.to_csv(os.path.join(csv_dir, 'V.csv'), sep='|')
-                self.V_prodVol.to_csv(os.path.join(csv_dir, 'V_prodVol.csv'),
-                                      sep='|')
-                self.G_act.to_csv(os.path.join(csv_dir, 'G_act.csv'), sep='|')
+                tables.update(products=self.products,
+                              activities=self.activities,
+                              U=self.U, V=self.V, V_prodVol=self.V_prodVol,
+                              G_act=self.G_act)
+
+            # Distinct files, written concurrently; labels stay comma-separated
+            with concurrent.futures.ThreadPoolExecutor(
+                    self.max_workers) as pool:
+                futures = [pool.submit(df.to_csv,
+                                       os.path.join(csv_dir, name + '.csv'),
+                                       sep=',' if name in ('PRO', 'STR')
+                                       else '|')
+                           for name, df in tables.items()]
+                for future in futures:
+                    future.result()
             self.log.info("Final matrices saved as CSV files in " + csv_dir)
 
         # Write to HDF5 files
@@ -2281,8 +2713,8 @@ class Ecospold2Matrix(object):
                 output.attrs[key] = val
 
             # write the actual data
-            self.PRO.fillna(0).to_hdf(output_file, key='/PRO', mode='a')
-            self.STR.fillna(0).to_hdf(output_file, key='/STR', mode='a')
+            self.PRO.astype(object).fillna(0).to_hdf(output_file, key='/PRO', mode='a')
+            self.STR.astype(object).fillna(0).to_hdf(output_file, key='/STR', mode='a')
             if self.C is not None:
                 self.C.fillna(0).to_hdf(output_file, key='/C', mode='a')
                 self.IMP.fillna(0).to_hdf(output_file, key='/IMP', mode='a')
@@ -2301,6 +2733,67 @@ class Ecospold2Matrix(object):
                 self.G_act.fillna(0).to_hdf(output_file, key='/G_ACT', mode='a')
             self.log.info("Final matrices saved as HDF5: {}".format(output_file))
 
+    def __cached(self, parse, *paths):
+        """ Parse master data files, or load the result of a previous parse
+
+        The result is pickled next to the first of the parsed files, under a
+        name that includes the SHA-1 of these files: any change in the master
+        data therefore triggers a new parse.
+
+        Args:
+        -----
+        * parse: function reading the master data files
+        * paths: the files read by parse()
+
+        Behaviour determined by:
+        ------------------------
+        * prefer_pickles: Whether or not to load the result of a previous
+                          parse, and pickle that of a new one for the next run
+
+        Returns:
+        --------
+        * the output of parse()
+
+        """
+        sha1 = ''.join(self.__hash_file(i) for i in paths)
+        if len(paths) > 1:
+            sha1 = hashlib.sha1(sha1.encode()).hexdigest()
+        filename = paths[0] + '.' + sha1 + '.pickle'
+
+        # EITHER LOAD FROM PREVIOUS ROUND...
+        if self.prefer_pickles and os.path.exists(filename):
+            with open(filename, 'rb', self.__PICKLEBUFFER) as f:
+                data = pickle.load(f)
+            self.log.info("Parsed data loaded from {}".format(filename))
+
+        # ...OR PARSE, pickling for further use if pickles are preferred
+        else:
+            data = parse()
+            if self.prefer_pickles:
+                with open(filename, 'wb', self.__PICKLEBUFFER) as f:
+                    pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+
+        return data
+
+    def __list_spold_files(self, data_folder):
+        """ List the ecospold files of a folder, scanning it only once
+
+        Args:
+        -----
+        * data_folder: directory of ecospold datasets
+
+        Returns:
+        --------
+        * list of paths to the .spold files in data_folder
+
+        """
+        try:
+            return self.__spold_files[data_folder]
+        except KeyError:
+            spold_files = glob.glob(os.path.join(data_folder, '*.spold'))
+            self.__spold_files[data_folder] = spold_files
+            return spold_files
+
     def __hash_file(self, afile):
         """ Get SHA-1 hash of binary file
 
@@ -2315,26 +2808,34 @@ class Ecospold2Matrix(object):
 
         """
 
-        blocksize = 65536
-        hasher = hashlib.sha1()
-        # Sometimes used for afile as filename
+        # Sometimes used for afile as filehandle, always hash whole file
+        path = os.path.abspath(getattr(afile, 'name', afile))
+        st = os.stat(path)
+        key = (path, st.st_mtime_ns, st.st_size)
         try:
-            f = open(afile, 'rb')
-            opened_here = True
-        # Or afile can be a filehandle
-        except TypeError:
-            f = afile
-            opened_here = False
-
-        buf = f.read(blocksize)
-        while len(buf) > 0:
-            hasher.update(buf)
-            buf = f.read(blocksize)
+            return self.__hashes[key]
+        except KeyError:
+            pass
 
-        if opened_here:
-            f.close()
+        # Hash in C: with hashlib's own read loop (python >= 3.11), or in one
+        # call over a memory map of the file, or else in 1 MB blocks where the
+        # file cannot be mapped (empty file, special filesystem)
+        with open(path, 'rb') as f:
+            if hasattr(hashlib, 'file_digest'):
+                h = hashlib.file_digest(f, 'sha1')
+            else:
+                h = hashlib.sha1()
+                try:
+                    with mmap.mmap(f.fileno(), 0,
+                                   access=mmap.ACCESS_READ) as mm:
+                        h.update(mm)
+                except (ValueError, OSError):
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        h.update(block)
+        sha1 = h.hexdigest()
 
-        return hasher.hexdigest()
+        self.__hashes[key] = sha1
+        return sha1
 
     def __deduplicate(self, raw_list, idcol=None, name=''):
         """ Removes duplicate entries from a list
@@ -2362,20 +2863,24 @@ class Ecospold2Matrix(object):
         id_deduplicated = []
         id_duplicates = []
 
-        # Find duplicate rows in list
+        # Find duplicate rows in list, keyed by hashable (tuple) rows, and in
+        # the same pass, if an "index column" is specified, find duplicate
+        # indexes in deduplicated. In other words, amongst unique rows, are
+        # there non-unique IDs?
+        seen = set()
+        seen_ids = set()
         for elem in raw_list:
-            if elem not in deduplicated:
-                deduplicated.append(elem)
-            else:
+            key = tuple(elem) if isinstance(elem, list) else elem
+            if key in seen:
                 duplicates.append(elem)
-
-        # If an "index column" is specified, find duplicate indexes in
-        # deduplicated. In other words, amongst unique rows, are there
-        # non-unique IDs?
-        if idcol is not None:
-            indexes = [row[idcol] for row in deduplicated]
-            for index in indexes:
-                if index not in id_deduplicated:
+                continue
+            seen.add(key)
+            deduplicated.append(elem)
+
+            if idcol is not None:
+                index = elem[idcol]
+                if index not in seen_ids:
+                    seen_ids.add(index)
                     id_deduplicated.append(index)
                 else:
                     id_duplicates.append(index)
@@ -2428,7 +2933,7 @@ class Ecospold2Matrix(object):
         units, __ = clean_up_columns(units)
         units = units.rename(columns=self.__SYNONYMS_IMPACT_UNITS)
         sep = '; '
-        units.index = [units.Method[i] + sep + units.Category[i] + sep + units.Indicator[i] for i in units.index]
+        units.index = units.Method + sep + units.Category + sep + units.Indicator
 
         # Read and clean characterisation factors
         cf = cf_file['CFs']
@@ -2471,7 +2976,7 @@ class Ecospold2Matrix(object):
                                 values='CF',
                                 columns='id',
                                 index=['Method', 'Category', 'Indicator'])
-        self.C.index = [i[0] + sep + i[1] + sep + i[2] for i in self.C.index]
+        self.C.index = self.C.index.map(sep.join)
         self.C = self.C.loc[~self.C.index.duplicated()]
 
         self.IMP = units.copy()
@@ -2629,15 +3134,21 @@ class Ecospold2Matrix(object):
         """
 
         # Read in parameter tables for CAS conflicts and known synonyms
-        def read_parameters(filename):
+        # (explicit dtypes, and only empty or 'NaN' fields as missing values,
+        # spare pandas its type and null sniffing)
+        def read_parameters(filename, dtype=str):
             #resource = pkg_resources.resource_filename(__name__, filename)
             resource = pkgutil.get_data(__name__, filename)
-            tmp = pd.read_csv(io.BytesIO(resource), sep='|', comment='#')
+            tmp = pd.read_csv(io.BytesIO(resource), sep='|', comment='#',
+                              engine='c', dtype=dtype,
+                              keep_default_na=False, na_values=['', 'NaN'])
             print(tmp)
-            return tmp.where(pd.notnull(tmp), None)
+            return tmp.replace({np.nan: None})
         self._cas_conflicts = read_parameters('parameters/cas_conflicts.csv')
-        self._synonyms = read_parameters('parameters/synonyms.csv')
-        self._custom_factors = read_parameters('parameters/custom_factors.csv')
+        self._synonyms = read_parameters('parameters/synonyms.csv',
+                                         {'approximationLevel': 'int64'})
+        self._custom_factors = read_parameters(
+                'parameters/custom_factors.csv', {'factorValue': 'float64'})
 
         # MORE HARDCODED PARAMETERS
 
@@ -2705,6 +3216,17 @@ class Ecospold2Matrix(object):
         c.execute('PRAGMA foreign_keys = ON;')
         self.conn.commit()
 
+        # The database is a scratch workspace, rebuilt at each run, so trade
+        # durability for bulk insert speed, and memory-map it for the
+        # read-heavy matching lookups
+        c.executescript("""
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            PRAGMA cache_size = -262144;
+            PRAGMA temp_store = MEMORY;
+            PRAGMA mmap_size = 268435456;
+            """)
+
         here = os.path.abspath(os.path.dirname(__file__))
         with open(os.path.join(here,'initialize_database.sql'),'r') as f:
             c.executescript(f.read())
@@ -2713,165 +3235,168 @@ class Ecospold2Matrix(object):
         self.log.warning("obs2char_subcomps constraints temporarily relaxed because not full recipe parsed")
 
 
-    def clean_label(self, table, name_cols = ('name', 'name2')):
+    def clean_label(self, table, name_cols = ('name', 'name2'),
+                    harmonized=False):
         """ Harmonize notation and correct for mistakes in label sqlite table
+
+        If harmonized, the table was loaded from _harmonize_labels() and its
+        units, compartments and names need no trimming or harmonizing
         """
 
         c = self.conn.cursor()
         table = scrub(table)
 
+        # All statements run in a single transaction (implicitly opened by the
+        # first update), committed once at the end
+
         # Harmonize label units
-        c.executescript( """
-            UPDATE {t} set unit=trim(unit);
-            update {t} set unit='m3' where unit='Nm3';
-            update {t} set unit='m2a' where unit='m2*year';
-            update {t} set unit='m3a' where unit='m3*year';
-            """.format(t=table))
+        statements = [] if harmonized else [
+                      "update {t} set unit=trim(unit)",
+                      "update {t} set unit='m3' where unit='Nm3'",
+                      "update {t} set unit='m2a' where unit='m2*year'",
+                      "update {t} set unit='m3a' where unit='m3*year'"]
 
         # TRIM, AND HARMONIZE COMP, SUBCOMP, AND OTHER  NAMES
-        c.executescript( """
-            UPDATE {t}
-            SET comp=trim((lower(comp))),
-            subcomp=trim((lower(subcomp))),
-            name=trim(name),
-            name2=trim(name2),
-            cas=trim(cas);
+        statements += [] if harmonized else [
+            """ UPDATE {t}
+                SET comp=trim((lower(comp))),
+                subcomp=trim((lower(subcomp))),
+                name=trim(name),
+                name2=trim(name2),
+                cas=trim(cas)""",
 
-            update {t} set subcomp='unspecified'
-            where subcomp is null or subcomp='(unspecified)' or subcomp='';
+            """ update {t} set subcomp='unspecified'
+                where subcomp is null or subcomp='(unspecified)'
+                or subcomp=''""",
 
-            update {t} set subcomp='low population density'
-            where subcomp='low. pop.';
+            """ update {t} set subcomp='low population density'
+                where subcomp='low. pop.'""",
 
-            update {t} set subcomp='high population density'
-            where subcomp='high. pop.';
+            """ update {t} set subcomp='high population density'
+                where subcomp='high. pop.'""",
 
-            update {t} set comp='resource' where comp='raw';
-            update {t} set comp='resource' where comp='natural resource';
-            """.format(t=table))
+            "update {t} set comp='resource' where comp='raw'",
+            "update {t} set comp='resource' where comp='natural resource'"]
 
+        for sql in statements:
+            c.execute(sql.format(t=table))
 
         try:
-            c.executescript("""
-                update {t} set impactId=replace(impactId,')','');
-                update {t} set impactId=replace(impactid,'(','_');
-                """.format(t=table))
+            c.execute("update {t} set impactId=replace(impactId,')','')"
+                      .format(t=table))
+            c.execute("update {t} set impactId=replace(impactid,'(','_')"
+                      .format(t=table))
         except sqlite3.OperationalError:
-            # Not every label has a impactId column...
+            # Not every label has a impactId column... (rejected before any
+            # change, the transaction goes on)
             pass
 
-        # NULLIFY SOME COLUMNS IF ARGUMENTS OF LENGTH ZERO
-        for col in ('cas',) + name_cols:
-            col = scrub(col)
-            c.execute("""
-                update {t} set {c}=null
-                where length({c})=0;""".format(t=table, c=col))
+        statements = []
 
-            c.execute(""" update {t}
-                          set {c} = replace({c}, ', biogenic', ', non-fossil')
-                          where {c} like '%, biogenic%'
-                          """.format(t=table, c=col))
+        # NULLIFY SOME COLUMNS IF ARGUMENTS OF LENGTH ZERO, and biogenic ->
+        # non-fossil, all columns in one pass
+        cols = [scrub(col) for col in ('cas',) + name_cols]
+        statements.append(""" update {t} set {s}
+                              where {w}""".format(
+            t=table,
+            s=', '.join("{c}=replace(nullif({c}, ''), ', biogenic',"
+                        " ', non-fossil')".format(c=col) for col in cols),
+            w=' or '.join("{c}='' or {c} like '%, biogenic%'".format(c=col)
+                          for col in cols)))
 
         # Clean up names
-        c.executescript("""
-                        update {t}
-                        set name=replace(name,', in ground',''),
-                            name2=replace(name2, ', in ground','')
-                        where (name like '% in ground'
-                               or name2 like '% in ground');
-
-                        update {t}
-                        set name=replace(name,', unspecified',''),
-                            name=replace(name,', unspecified','')
-                        where ( name like '%, unspecified'
-                                OR  name2 like '%, unspecified');
-
-                        update {t}
-                        set name=replace(name,'/m3',''),
-                            name2=replace(name2,'/m3','')
-                        where name like '%/m3';
-
-                        """.format(t=table))
-
-        # DEFINE  TAGS BASED ON NAMES
+        statements += [
+            """ update {t}
+                set name=replace(name,', in ground',''),
+                    name2=replace(name2, ', in ground','')
+                where (name like '% in ground'
+                       or name2 like '% in ground')""".format(t=table),
+
+            """ update {t}
+                set name=replace(name,', unspecified',''),
+                    name=replace(name,', unspecified','')
+                where ( name like '%, unspecified'
+                        OR  name2 like '%, unspecified')""".format(t=table),
+
+            """ update {t}
+                set name=replace(name,'/m3',''),
+                    name2=replace(name2,'/m3','')
+                where name like '%/m3'""".format(t=table)]
+
+        # DEFINE  TAGS BASED ON NAMES, as (condition, tag) rules
+        # (suffix LIKEs cannot use an index, and sqlite has no reverse() to
+        # turn them into prefixes; substr() comparisons proved no faster)
+        rules = []
         for tag in ('total', 'organic bound', 'fossil', 'non-fossil', 'as N'):
-            for name in name_cols:
-                c.execute(""" update {t} set tag='{ta}'
-                              where ({n} like '%, {ta}');
-                          """.format(t=table, ta=tag, n=scrub(name)))
+            rules.append((' or '.join("{n} like '%, {ta}'".format(
+                                          n=scrub(name), ta=tag)
+                                      for name in name_cols), tag))
 
-        self.conn.commit()
         # Define more tags
-        c.execute("""
-                        update {t} set tag='fossil'
-                        where name like '% from soil or biomass stock'
-                        or name2 like '% % from soil or biomass stock';
-                  """.format(t=table))
-        c.execute("""
-                        update {t} set tag='mix'
-                        where name like '% compounds'
-                        or name2 like '% compounds';
-                  """.format(t=table))
-
-        c.execute("""
-                        update {t} set tag='alpha radiation'
-                        where (name like '%alpha%' or name2 like '%alpha%')
-                        and unit='kbq';
-                  """.format(t=table))
+        rules += [("name like '% from soil or biomass stock'"
+                   " or name2 like '% % from soil or biomass stock'", 'fossil'),
+                  ("name like '% compounds' or name2 like '% compounds'",
+                   'mix'),
+                  ("unit='kbq' and (name like '%alpha%' or name2 like '%alpha%')",
+                   'alpha radiation')]
+
+        # All tags in a single pass, later rules prevailing
+        statements.append(""" update {t} set tag=case {cases} end
+                              where {conditions}""".format(
+            t=table,
+            cases=' '.join("when {} then '{}'".format(condition, tag)
+                           for condition, tag in reversed(rules)),
+            conditions=' or '.join('({})'.format(condition)
+                                   for condition, _ in rules)))
 
         # Different types of "water", treat by name, not cas:
-        c.execute("""update {t} set cas=NULL
-                     where name like '%water%'""".format(t=table))
-
-
-        # REPLACE FAULTY CAS NUMBERS CLEAN UP
-        for i, row in self._cas_conflicts.iterrows():
-            #if table == 'raw_char':
-            org_cas = copy.deepcopy(row.bad_cas)
-            aName = copy.deepcopy(row.aName)
-            if row.aName is not None and row.bad_cas is not None:
-                c.execute(""" update {t} set cas=?
-                              where (name like ? or name2 like ?)
-                              and cas=?""".format(t=table),
-                          (row.cas, row.aName, row.aName, row.bad_cas))
-
-            elif row.aName is None:
-                c.execute("""select distinct name from {t}
-                             where cas=?;""".format(t=table), (row.bad_cas,))
-                try:
-                    aName = c.fetchone()[0]
-                except TypeError:
-                    aName = '[]'
-
-                c.execute(""" update {t} set cas=?
-                              where cas=?
-                          """.format(t=table), (row.cas, row.bad_cas))
-
-            else: # aName, but no bad_cas specified
-                c.execute(""" select distinct cas from {t}
-                              where (name like ? or name2 like ?)
-                          """.format(t=table),(row.aName, row.aName))
-                try:
-                    org_cas = c.fetchone()[0]
-                except TypeError:
-                    org_cas = '[]'
-
-                c.execute(""" update {t} set cas=?
-                              where (name like ? or name2 like ?)
-                              """.format(t=table),
-                              (row.cas, row.aName, row.aName))
-
-            if c.rowcount:
-                msg="Substituted CAS {} by {} for {} because {}"
-                self.log.info(msg.format( org_cas, row.cas, aName, row.comment))
-
-
+        statements.append("""update {t} set cas=NULL
+                     where cas is not null
+                     and name like '%water%'""".format(t=table))
+
+        for sql in statements:
+            c.execute(sql)
+
+
+        # REPLACE FAULTY CAS NUMBERS CLEAN UP, all conflicts at once: each
+        # label takes the CAS of the last conflict matching its (bad) CAS
+        # and/or its name. Conflicts staged in a temporary table, within the
+        # transaction
+        c.execute("drop table if exists temp.cas_conflicts")
+        c.execute(""" create temp table cas_conflicts(
+                          rule integer, cas text, aName text, bad_cas text,
+                          comment text)""")
+        self._insert_rows('cas_conflicts',
+                          self._cas_conflicts.rename_axis('rule').reset_index())
+        match = """(x.bad_cas is not null or x.aName is not null)
+                   and (x.bad_cas is null or {t}.cas=x.bad_cas)
+                   and (x.aName is null or {t}.name like x.aName
+                        or {t}.name2 like x.aName)""".format(t=table)
+
+        # Log substitutions, as found before any is made
+        c.execute(""" select x.cas, x.aName, x.bad_cas, x.comment,
+                             min({t}.name), min({t}.cas)
+                      from cas_conflicts x join {t} on {m}
+                      group by x.rule order by x.rule
+                  """.format(t=table, m=match))
+        msg = "Substituted CAS {} by {} for {} because {}"
+        for cas, aName, org_cas, comment, name, cas_found in c.fetchall():
+            if aName is None:
+                aName = name
+            if org_cas is None:
+                org_cas = cas_found
+            self.log.info(msg.format(org_cas, cas, aName, comment))
+
+        c.execute(""" update {t} set cas=(
+                          select x.cas from cas_conflicts x where {m}
+                          order by x.rule desc limit 1)
+                      where exists (select 1 from cas_conflicts x where {m})
+                  """.format(t=table, m=match))
+        c.execute("drop table cas_conflicts")
 
         self.conn.commit()
 
 
-
-
     def process_inventory_elementary_flows(self):
         """Input inventoried stressor flow table (STR) to database and clean up
 
@@ -2880,34 +3405,37 @@ class Ecospold2Matrix(object):
         """
 
         # clean up: remove leading zeros in front of CAS numbers
-        self.STR.cas = self.STR.cas.str.replace('^[0]*','')
+        self.STR.cas = self.STR.cas.str.lstrip('0')
 
-        # export to tmp SQL table
-        c = self.conn.cursor()
-        self.STR.to_sql('dirty_inventory',
-                        self.conn,
-                        index_label='id',
-                        if_exists='replace')
-        c.execute( """
-        INSERT INTO raw_inventory(id, name, comp, subcomp, unit, cas)
-        SELECT DISTINCT id, name, comp, subcomp, unit, cas
-        FROM dirty_inventory;
-        """)
+        # export to SQL table
+        self._insert_rows('raw_inventory',
+                          _harmonize_labels(self.STR.assign(
+                              id=self.STR.index)[
+                              ['id', 'name', 'comp', 'subcomp', 'unit',
+                               'cas']]),
+                          distinct=True)
 
-        self.clean_label('raw_inventory')
+        self.clean_label('raw_inventory', harmonized=True)
         self.conn.commit()
 
     def read_characterisation(self):
         """Input characterisation factor table (STR) to database and clean up
         """
 
-        def xlsrange(wb, sheetname, rangename):
-            ws = wb.sheet_by_name(sheetname)
+        def xlsrange(ws, rangename):
+            # values of each column of a cell range, e.g. 'H4:M6', empty as ''
             ix = xlwt.Utils.cellrange_to_rowcol_pair(rangename)
-            values = []
-            for i in range(ix[1],ix[3]+1):
-                values.append(tuple(ws.col_values(i, ix[0], ix[2]+1)))
-            return values
+            values = ws.iloc[ix[0]:ix[2]+1, ix[1]:ix[3]+1].fillna('')
+            return list(values.T.itertuples(index=False, name=None))
+
+        def xlscols(rangename):
+            # positions of the columns of column ranges, e.g. 'B:G,N:P'
+            cols = []
+            for part in rangename.split(','):
+                first, last = part.split(':')
+                cols += range(xlwt.Utils.col_by_name(first),
+                              xlwt.Utils.col_by_name(last) + 1)
+            return cols
 
         c = self.conn.cursor()
 
@@ -2944,91 +3472,80 @@ class Ecospold2Matrix(object):
         headers = ['comp','subcomp','charName','simaproName','cas','unit']
 
         if self.prefer_pickles and os.path.exists(picklename):
-            with open(picklename, 'rb') as f:
+            with open(picklename, 'rb', self.__PICKLEBUFFER) as f:
                 [imp, raw_char] = pickle.load(f)
         else:
             # Get all impact categories directly from excel file
             print("reading for impacts")
             self.log.info("CAREFUL! Make sure you shift headers to the right by"
                     " 1 column in FDP sheet of {}".format(self.characterisation_file))
-            wb = xlrd.open_workbook(self.characterisation_file)
-            imp =[]
-            for sheet in hardcoded:
-                print(imp)
-                imp = imp + xlsrange(wb, sheet['name'], sheet['impact_meta'])
+            # Parse each sheet once, whole; impacts and factors are cut out of it
+            sheets = pd.read_excel(self.characterisation_file, header=None,
+                                   sheet_name=list({sheet['name']: None
+                                                    for sheet in hardcoded}))
+            imp = [meta for sheet in hardcoded
+                   for meta in xlsrange(sheets[sheet['name']],
+                                        sheet['impact_meta'])]
             imp = pd.DataFrame(columns=['perspective','unit', 'impactId'],
                                data=imp)
             #imp.impactId = imp.impactId.str.replace(' ', '_')
-            imp.impactId = imp.impactId.str.replace('(', '_')
-            imp.impactId = imp.impactId.str.replace(')', '')
-
-            # GET ALL CHARACTERISATION FACTORS
-            raw_char = pd.DataFrame()
-            for i in range(len(hardcoded)):
-                sheet = hardcoded[i]
-                j = pd.io.excel.read_excel(self.characterisation_file,
-                                             sheet['name'],
-                                             skiprows=range(sheet['rows']),
-                                             parse_cols=sheet['range'])
-
+            imp.impactId = imp.impactId.str.replace('(', '_', regex=False)
+            imp.impactId = imp.impactId.str.replace(')', '', regex=False)
 
-                # clean up a bit
-                j.rename(columns=self._header_harmonizing_dict, inplace=True)
-
-                try:
-                    j.cas = j.cas.str.replace('^[0]*','')
-                except AttributeError:
-                    pass
+            # GET ALL CHARACTERISATION FACTORS, from the parsed sheets
+            renames = self._header_harmonizing_dict
+            frames = []
+            for sheet in hardcoded:
+                ws = sheets[sheet['name']]
+                cols = xlscols(sheet['range'])
+                j = ws.iloc[sheet['rows'] + 1:, cols].infer_objects()
+                j.columns = ws.iloc[sheet['rows'], cols].tolist()
+                j = j.rename(columns=renames, copy=False)
+
+                # clean up a bit, skipping the (many) substances without any
+                # factor, then one row per impact and factor
+                j = j.dropna(how='all', subset=j.columns.difference(headers))
                 j.loc[:, headers] = j.loc[:, headers].fillna('')
-                j = j.set_index(headers).stack(dropna=True).reset_index(-1)
-                j.columns=['impactId','factorValue']
-
+                frames.append(j.melt(id_vars=headers, var_name='impactId',
+                                     value_name='factorValue'
+                                     ).dropna(subset=['factorValue']))
 
-                # concatenate
-                try:
-                    raw_char = pd.concat([raw_char, j], axis=0, join='outer')
-                except NameError:
-                    raw_char = j.copy()
-                except:
-                    self.log.warning("Problem with concat")
+            # concatenate once
+            raw_char = pd.concat(frames, axis=0, ignore_index=True
+                                 ).set_index(headers)
 
             # Pickle raw_char as read
             self.log.info("Done with concatenating")
-            with open(picklename, 'wb') as f:
-                pickle.dump([imp, raw_char], f)
+            with open(picklename, 'wb', self.__PICKLEBUFFER) as f:
+                pickle.dump([imp, raw_char], f, pickle.HIGHEST_PROTOCOL)
 
-        # Define numerical index
+        # Define numerical index, remove leading zeros in front of CAS numbers
         raw_char.reset_index(inplace=True)
+        raw_char['cas'] = raw_char.cas.str.lstrip('0').fillna('')
 
         # insert impacts to SQL
-        imp.to_sql('tmp', self.conn, if_exists='replace', index=False)
-        c.execute("""insert or ignore into impacts(
-                            perspective, unit, impactId)
-                    select perspective, unit, impactId
-                    from tmp;""")
+        self._insert_rows('impacts', imp[['perspective', 'unit', 'impactId']],
+                          verb='insert or ignore')
 
         # insert raw_char to SQL
-        raw_char.to_sql('tmp', self.conn, if_exists='replace', index=False)
-        c.execute("""
-        insert into raw_char(
-                comp, subcomp, name, name2, cas, unit, impactId, factorValue)
-        select distinct comp, subcomp, charName, simaproName, cas,
-        unit, impactId, factorValue
-        from tmp;
-        """)
+        self._insert_rows('raw_char',
+                          _harmonize_labels(raw_char.rename(
+                              columns={'charName': 'name',
+                                       'simaproName': 'name2'})[
+                              ['comp', 'subcomp', 'name', 'name2', 'cas',
+                               'unit', 'impactId', 'factorValue']]),
+                          distinct=True)
 
         # RECIPE-SPECIFIC Pre-CLEAN UP
 
         # add Chromium VI back, since it did NOT get read in the spreadsheet
         # (Error512 in the spreadsheet)
-        c.executescript("""
-        create temporary table tmp_cr as select * from raw_char
-                                         where cas='7440-47-3';
-        update tmp_cr set id = NULL,
-                          name='Chromium VI',
-                          name2='Chromium VI',
-                          cas='18540-29-9';
-        insert into raw_char select * from tmp_cr;
+        c.execute("""
+        insert into raw_char(comp, subcomp, name, name2, cas, tag, unit,
+                             impactId, factorValue, substId)
+        select comp, subcomp, 'Chromium VI', 'Chromium VI', '18540-29-9', tag,
+               unit, impactId, factorValue, substId
+        from raw_char where cas='7440-47-3';
         """)
         self.log.info(
                 "Fixed the NaN values for chromium VI in ReCiPe spreadsheet,"
@@ -3039,7 +3556,7 @@ class Ecospold2Matrix(object):
         c.execute("""
             update raw_char
             set name='Copper, ion', name2='Copper, ion'
-            where comp='water' and name like 'copper'
+            where comp='water' and name='copper' COLLATE NOCASE
             """)
         if c.rowcount:
             self.log.info("For compatibility with ecoinvent, forced {} copper"
@@ -3047,7 +3564,7 @@ class Ecospold2Matrix(object):
                   " of neutral.".format(c.rowcount))
 
         # MAJOR CLEANUP
-        self.clean_label('raw_char')
+        self.clean_label('raw_char', harmonized=True)
 
         # COMPARTMENT SPECIFIC FIXES,
         # i.e., ions out of water in char, or neutral in water in inventory
@@ -3055,7 +3572,8 @@ class Ecospold2Matrix(object):
                 UPDATE raw_char
                  SET cas='16065-83-1', name='Chromium III', name2='Chromium III'
                  WHERE cas='7440-47-3' AND comp='water' AND
-                 (name LIKE 'chromium iii' OR name2 LIKE 'chromium iii')
+                 (name='chromium iii' COLLATE NOCASE
+                  OR name2='chromium iii' COLLATE NOCASE)
                   """)
         if c.rowcount:
             self.log.info("Changed CAS changed one of the two names of {}"
@@ -3067,17 +3585,17 @@ class Ecospold2Matrix(object):
                   update raw_char
                   set name='Chromium', name2='Chromium'
                   WHERE cas='7440-46-3' AND comp<>'water' AND
-                  (name like 'chromium' or name2 like 'chromium')
+                  (name='chromium' COLLATE NOCASE
+                   or name2='chromium' COLLATE NOCASE)
                   """)
 
         # add separate neutral Ni in groundwater, because exists in ecoinvent
-        c.executescript("""
-        create temporary table tmp_ni as select * from raw_char
-                                         where cas='14701-22-5' and
-                                         subcomp='river';
-        update tmp_ni set id = NULL, name='Nickel', name2='Nickel',
-        cas='7440-02-0';
-        insert into raw_char select * from tmp_ni;
+        c.execute("""
+        insert into raw_char(comp, subcomp, name, name2, cas, tag, unit,
+                             impactId, factorValue, substId)
+        select comp, subcomp, 'Nickel', 'Nickel', '7440-02-0', tag, unit,
+               impactId, factorValue, substId
+        from raw_char where cas='14701-22-5' and subcomp='river';
         """)
 
         self.conn.commit()
@@ -3090,8 +3608,18 @@ class Ecospold2Matrix(object):
 
         self._synonyms.to_sql('synonyms', self.conn, if_exists='replace')
 
-        # Populate comp and subcomp
+        # Synonyms are looked up by either name, at a given approximation
         c = self.conn.cursor()
+        c.executescript(
+            """
+        CREATE INDEX synonymsByAName
+        ON synonyms(aName COLLATE NOCASE, approximationLevel);
+
+        CREATE INDEX synonymsByAnotherName
+        ON synonyms(anotherName COLLATE NOCASE, approximationLevel);
+            """)
+
+        # Populate comp and subcomp
         c.executescript(
             """
         INSERT INTO comp(compName)
@@ -3129,17 +3657,14 @@ class Ecospold2Matrix(object):
                                 self.conn,
                                 if_exists='replace',
                                 index=False)
+        self._custom_factors.to_sql('custom_factors',
+                                    self.conn,
+                                    if_exists='replace',
+                                    index=False)
 
-        self.conn.commit()
-        c.executescript(
-        """
-        -- 2.1 Add Schemes
-
-        INSERT or ignore INTO schemes(NAME) SELECT '{}';
-        INSERT OR IGNORE INTO schemes(NAME) SELECT 'simapro';
-        INSERT OR IGNORE INTO schemes(NAME) SELECT '{}';
-
-        """.format(self.version_name, self.char_method))
+        # 2.1 Add Schemes
+        c.executemany("INSERT OR IGNORE INTO schemes(NAME) VALUES (?);",
+                      [(self.version_name,), ('simapro',), (self.char_method,)])
 
 
 
@@ -3165,29 +3690,20 @@ class Ecospold2Matrix(object):
 
         # Fix column names and clean up CAS numbers in DataFrame
         self.STR_old.rename(columns=self._header_harmonizing_dict, inplace=True)
-        self.STR_old.cas = self.STR_old.cas.str.replace('^[0]*','')
-
-        # save to tmp table in sqlitedb
-        c = self.conn.cursor()
-        self.STR_old.to_sql('tmp', self.conn, if_exists='replace', index=False)
+        self.STR_old.cas = self.STR_old.cas.str.lstrip('0')
 
         # populate old_labels
-        c.executescript("""
-            INSERT INTO old_labels(ardaid,
-                                   name,
-                                   name2,
-                                   name3,
-                                   cas,
-                                   comp,
-                                   subcomp,
-                                   unit)
-            SELECT DISTINCT ardaid, name, name2, name3, cas, comp, subcomp, unit
-            FROM tmp;
-            """)
+        c = self.conn.cursor()
+        self._insert_rows('old_labels',
+                          _harmonize_labels(
+                              self.STR_old[['ardaid', 'name', 'name2', 'name3',
+                                            'cas', 'comp', 'subcomp', 'unit']]),
+                          distinct=True)
 
 
         # clean up
-        self.clean_label('old_labels', ('name', 'name2', 'name3'))
+        self.clean_label('old_labels', ('name', 'name2', 'name3'),
+                         harmonized=True)
 
         # match substid by cas and tag
         sql_command="""
@@ -3195,25 +3711,27 @@ class Ecospold2Matrix(object):
             set substid=(select distinct s.substid
                          from substances as s
                          where old_labels.cas=s.cas and
-                         old_labels.tag like s.tag)
+                         old_labels.tag=s.tag COLLATE NOCASE)
             where old_labels.substId is null
             and old_labels.cas is not null;
             """
         self._updatenull_log(sql_command, 'old_labels', 'substid', log_msg=
                 "Matched {} with CAS from old_labels, out of {} unmatched rows." )
 
-        # match substid by name and tag matching
-        for name in ('name','name2', 'name3'):
-            sql_command="""
-                update old_labels
-                set substid=(select distinct n.substid
-                             from names as n
-                             where old_labels.{n} like n.name and
-                             old_labels.tag like n.tag)
-                where old_labels.substId is null
-            ;""".format(n=scrub(name))
-            self._updatenull_log(sql_command, 'old_labels', 'substid', log_msg=
-                    "Matched {} with name and tag matching, out of {} unmatched rows from old_labels.")
+        # match substid by name and tag matching, name first, then name2,
+        # then name3, in a single pass
+        sql_command="""
+            update old_labels
+            set substid=coalesce({})
+            where old_labels.substId is null
+        ;""".format(', '.join("""
+                         (select distinct n.substid
+                          from names as n
+                          where old_labels.tag=n.tag COLLATE NOCASE and
+                          old_labels.{n}=n.name COLLATE NOCASE)""".format(n=name)
+                              for name in ('name', 'name2', 'name3')))
+        self._updatenull_log(sql_command, 'old_labels', 'substid', log_msg=
+                "Matched {} with name and tag matching, out of {} unmatched rows from old_labels.")
 
         # match substid by cas only
         sql_command="""
@@ -3228,17 +3746,18 @@ class Ecospold2Matrix(object):
             "Matched {} from old_labels by CAS only, out of {} unmatched rows.")
         self.conn.commit()
 
-        # match substid by name only
-        for name in ('name','name2', 'name3'):
-            sql_command = """
-                update old_labels
-                set substid=(select distinct n.substid
-                             from names as n
-                             where old_labels.{n} like n.name)
-                where substId is null
-            ;""".format(n=scrub(name))
-            self._updatenull_log(sql_command, 'old_labels', 'substid', log_msg=
-                "Matched {} from old_labels by name only, out of {} unmatched rows.")
+        # match substid by name only, likewise
+        sql_command = """
+            update old_labels
+            set substid=coalesce({})
+            where substId is null
+        ;""".format(', '.join("""
+                         (select distinct n.substid
+                          from names as n
+                          where old_labels.{n}=n.name COLLATE NOCASE)""".format(
+                              n=name) for name in ('name', 'name2', 'name3')))
+        self._updatenull_log(sql_command, 'old_labels', 'substid', log_msg=
+            "Matched {} from old_labels by name only, out of {} unmatched rows.")
 
 
         # document unmatched old_labels
@@ -3273,6 +3792,10 @@ class Ecospold2Matrix(object):
 
         """
 
+        # Statistics on the populated tables, for the query planner to pick
+        # indexes in the matching queries
+        self.conn.execute('ANALYZE')
+
         # Integrate substances based on CAS for each table
         self._integrate_flows_withCAS(tables)
 
@@ -3288,6 +3811,9 @@ class Ecospold2Matrix(object):
         if self.STR_old is not None:
             self._integrate_old_labels()
 
+        # Refresh statistics, now that factors and labels are populated
+        self.conn.execute('ANALYZE')
+
         # Produce stressor label (STR), impact labels (IMP),  and
         # characterisation matrix (C)
         self._characterisation_matching()
@@ -3305,31 +3831,38 @@ class Ecospold2Matrix(object):
             SET substid=(
                     SELECT n.substid
                     FROM names as n
-                    WHERE ({t}.name like n.name or {t}.name2 like n.name)
-                    AND {t}.tag IS n.tag
+                    WHERE {t}.tag IS n.tag
+                    AND ({t}.name=n.name COLLATE NOCASE
+                         or {t}.name2=n.name COLLATE NOCASE)
                     )
             WHERE {t}.substid IS NULL
             AND {t}.cas IS NULL;
             """.format(t=scrub(table)))
 
         # Match with known synonyms, in decreasing order of accuracy in
-        # approximation
-        for i in np.sort(self._synonyms.approximationLevel.unique()):
-            for j in [('aName', 'anotherName'),('anotherName', 'aName')]:
-                c.execute("""
-                    UPDATE OR ignore {t}
-                    SET substid=(
-                                SELECT DISTINCT n.substid
-                                 FROM names as n, synonyms as s
-                                 WHERE ({t}.name like s.{c0}
-                                     OR {t}.name2 like s.{c0})
-                                 AND s.{c1} like n.name
-                                 AND {t}.tag IS n.tag
-                                 AND s.approximationLevel = ?)
-                    WHERE {t}.substid IS NULL
-                    AND {t}.cas IS NULL
-                    """.format(t=scrub(table), c0=scrub(j[0]), c1=scrub(j[1])),
-                    [str(i)])
+        # approximation, and from aName to anotherName before the reverse,
+        # all in one pass
+        # (synonyms may hold wildcards, e.g. 'Occupation, arable%', hence LIKE)
+        forward = """s.anotherName=n.name COLLATE NOCASE
+                       AND ({t}.name like s.aName OR {t}.name2 like s.aName)
+                   """.format(t=scrub(table))
+        backward = """s.aName=n.name COLLATE NOCASE
+                        AND ({t}.name like s.anotherName
+                             OR {t}.name2 like s.anotherName)
+                   """.format(t=scrub(table))
+        c.execute("""
+            UPDATE OR ignore {t}
+            SET substid=(
+                        SELECT n.substid
+                         FROM names as n, synonyms as s
+                         WHERE {t}.tag IS n.tag
+                         AND (({f}) OR ({b}))
+                         ORDER BY s.approximationLevel,
+                                  s.anotherName=n.name COLLATE NOCASE DESC
+                         LIMIT 1)
+            WHERE {t}.substid IS NULL
+            AND {t}.cas IS NULL
+            """.format(t=scrub(table), f=forward, b=backward))
         self.conn.commit()
 
     def _insert_names_from_labels(self, table):
@@ -3428,8 +3961,9 @@ class Ecospold2Matrix(object):
             SET substid=(
                     SELECT s.substid
                     FROM substances s
-                    WHERE ({t}.name like s.aName OR {t}.name2 like s.aName)
-                    AND {t}.tag IS s.tag
+                    WHERE {t}.tag IS s.tag
+                    AND ({t}.name=s.aName COLLATE NOCASE
+                         OR {t}.name2=s.aName COLLATE NOCASE)
                     )
             WHERE substid IS NULL
             ;
@@ -3467,13 +4001,14 @@ class Ecospold2Matrix(object):
         c = self.conn.cursor()
 
         # Check for apparent synonyms that have different substance Ids
-        # and log warning
-        c.executescript(
+        # and log warning (both names are probed on the unique name index)
+        c.execute(
         """
         select distinct r.name, n1.substid, r.name2, n2.substid
-        from raw_char r, names n1, names n2
-        where r.name=n1.name and r.name2=n2.name
-        and n1.substid <> n2.substid;
+        from raw_char r
+        inner join names n1 on n1.name = r.name
+        inner join names n2 on n2.name = r.name2
+        where n1.substid <> n2.substid;
         """)
         missed_synonyms = c.fetchall()
         if len(missed_synonyms):
@@ -3494,8 +4029,9 @@ class Ecospold2Matrix(object):
         # plural
         c.execute(
         """
-        select * from Names as n1, Names as n2
-        where n1.name like n2.name||'s' and n1.substid <> n2.substid;
+        select * from Names as n1
+        inner join Names as n2 on n1.name = n2.name||'s' COLLATE NOCASE
+        where n1.substid <> n2.substid;
         """)
         missed_plurals = c.fetchall()
         if len(missed_plurals):
@@ -3503,28 +4039,34 @@ class Ecospold2Matrix(object):
             print(missed_plurals)
 
 
-        # Match Names with Schemes (Simapro, Recipe, Ecoinvent, etc.)
-        self.conn.executescript("""
-        --- match names with scheme of self.version_name
+        # Match Names with Schemes (Simapro, Recipe, Ecoinvent, etc.), bound
+        # to the scheme names as stored by populate_complementary_tables()
+
+        # match names with scheme of self.version_name
+        c.execute("""
         INSERT INTO nameHasScheme
         SELECT DISTINCT n.nameId, s.schemeId from names n, schemes s
         WHERE n.name in (SELECT DISTINCT name FROM raw_inventory)
-        and s.name='{}';
+        and s.name=?;
+        """, (self.version_name,))
 
-        --- match names with scheme of self.char_method
+        # match names with scheme of self.char_method
+        c.execute("""
         insert into nameHasScheme
         select distinct n.nameId, s.schemeId from names n, schemes s
         where n.name in (select name from raw_char)
-        and s.name='{}';
+        and s.name=?;
+        """, (self.char_method,))
 
-        --- match alternative name in characterisation method (name2) with
-        --- simapro scheme (hardcoded)
+        # match alternative name in characterisation method (name2) with
+        # simapro scheme (hardcoded)
+        c.execute("""
         insert into nameHasScheme
         select distinct n.nameId, s.schemeId
         from names n, schemes s
         where n.name in (select name2 from raw_char)
         and s.name='simapro';
-        """.format(scrub(self.version_name), scrub(self.char_method)))
+        """)
 
         # For each table, prepare labels and, if applicable, populate
         # factors table with characterisation factors
@@ -3535,7 +4077,6 @@ class Ecospold2Matrix(object):
             else:
                 t_out = 'labels_char'
                 # Populate factors table
-                self.conn.commit()
                 c.execute(# only loose constraint on table, the better to
                           # identify uniqueness conflicts and log problems in a
                           # few lines (as soon as for-loop is over)
@@ -3545,12 +4086,13 @@ class Ecospold2Matrix(object):
                     insert or ignore into factors(
                         substId, comp, subcomp, unit, impactId, factorValue, method)
                     select distinct
-                        substId, comp, subcomp, unit, impactId, factorValue, '{c}'
+                        substId, comp, subcomp, unit, impactId, factorValue, ?
                     from {t};
-                """.format(t=table, c=scrub(self.char_method))
+                """.format(t=table), (scrub(self.char_method),)
                 )
-            # Prepare labels
-            self.conn.executescript("""
+            # Prepare labels, with c.execute() rather than executescript(),
+            # which would commit the pending factors insert at each table
+            c.execute("""
             INSERT INTO {to}(
                 id, substId, name, name2, tag, comp, subcomp, cas, unit)
             SELECT DISTINCT
@@ -3558,41 +4100,53 @@ class Ecospold2Matrix(object):
             FROM {t};
             """.format(t=table, to=t_out))
 
-        # Customize characterizations based on custom_factors.csv
-        for i,row in self._custom_factors.iterrows():
-            c.execute("""
-            UPDATE OR IGNORE factors
-            SET factorValue=?
-            WHERE impactId = ?
-            AND substid=(SELECT DISTINCT substid
-                         FROM names WHERE name LIKE ?)
-            AND comp=? AND subcomp=? AND unit=?;""", (row.factorValue,
-                row.impactID, row.aName, row.comp, row.subcomp, row.unit))
-            if c.rowcount:
-                msg="Custimized {} factor to {} for {} ({}) in {} {}"
-                self.log.info(msg.format(row.impactID, row.factorValue,
-                    row.aName, row.unit, row.comp, row.subcomp))
-
-        # Identify conflicting characterisation factors
-        sql_command = """ select distinct
-                                f1.substid,
+        # Customize characterizations based on custom_factors.csv, all at
+        # once; should two custom factors target the same factor, the later
+        # one wins
+        c.execute("""
+        CREATE TEMP TABLE custom_matches AS
+        SELECT f.factorId, cf.rowid AS customId, cf.factorValue,
+               cf.impactID, cf.aName, cf.comp, cf.subcomp, cf.unit
+        FROM custom_factors cf
+        INNER JOIN factors f
+            ON f.impactId = cf.impactID AND f.comp = cf.comp AND
+               f.subcomp = cf.subcomp AND f.unit = cf.unit AND
+               f.substid = (SELECT DISTINCT substid
+                            FROM names WHERE name=cf.aName COLLATE NOCASE);
+        """)
+        c.execute("""
+        UPDATE OR IGNORE factors
+        SET factorValue=(SELECT m.factorValue FROM custom_matches m
+                         WHERE m.factorId = factors.factorId
+                         ORDER BY m.customId DESC LIMIT 1)
+        WHERE factorId IN (SELECT factorId FROM custom_matches);
+        """)
+        c.execute("""
+        SELECT DISTINCT impactID, factorValue, aName, unit, comp, subcomp
+        FROM custom_matches ORDER BY customId;
+        """)
+        msg="Custimized {} factor to {} for {} ({}) in {} {}"
+        for row in c.fetchall():
+            self.log.info(msg.format(*row))
+        c.execute("DROP TABLE custom_matches;")
+
+        # Identify conflicting characterisation factors, grouping rather than
+        # self-joining factors; one row per conflict, listing all its values
+        sql_command = """ select
+                                f.substid,
                                 s.aName,
-                                f1.comp,
-                                f1.subcomp,
-                                f1.unit,
-                                f1.impactId,
-                                f1.method,
-                                f1.factorValue,
-                                f2.factorValue
-                          from factors f1, factors f2, substances s
-                          where
-                              f1.substId=f2.substId and f1.substId=s.substId
-                              and f1.comp=f2.comp
-                              and f1.subcomp = f2.subcomp
-                              and f1.unit = f2.unit
-                              and f1.impactId = f2.impactId
-                              and f1.method = f2.method
-                              and f1.factorValue <> f2.factorValue; """
+                                f.comp,
+                                f.subcomp,
+                                f.unit,
+                                f.impactId,
+                                f.method,
+                                group_concat(distinct f.factorValue)
+                          from factors f
+                          inner join substances s on f.substId=s.substId
+                          where f.subcomp is not null
+                          group by f.substId, f.comp, f.subcomp, f.unit,
+                                   f.impactId, f.method
+                          having count(distinct f.factorValue) > 1; """
         factor_conflicts = pd.read_sql(sql_command, self.conn)
         for i, row in factor_conflicts.iterrows():
             self.log.warning("FAIL! Different characterization factor "
@@ -3608,127 +4162,125 @@ class Ecospold2Matrix(object):
 
         c = self.conn.cursor()
 
-        # Get all inventory flows straight in labelss_out
-        c.execute(
-        """
-        insert into labels_out(
-                dsid, substId, comp, subcomp,name, name2, cas, tag, unit)
-        select distinct
-                id, substId, comp, subcomp,name, name2, cas, tag, unit
-        from labels_inventory;
-        """)
-
-        c.execute("""
-        insert into labels_out(
-            substid, comp, subcomp, name, name2, cas, tag, unit)
-        select distinct
-            lc.substid, lc.comp, lc.subcomp, lc.name, lc.name2, lc.cas,
-            lc.tag, lc.unit
-        from labels_char lc
-        where not exists(select 1 from labels_out lo
-                         where lo.substid=lc.substid
-                         and lo.comp = lc.comp
-                         and lo.subcomp = lc.subcomp
-                         and lo.unit = lc.unit)
-        """)  # TODO: could improve labels_out, minimum data, then left join
-        # for cas, ardaid, name2, etc.
+        # Populate labels_out and obs2char in a single transaction, committed
+        # once at the end (with journal_mode OFF, a failure is not rolled back)
+        with self.conn:
+            # Get all inventory flows straight in labelss_out
+            c.execute(
+            """
+            insert into labels_out(
+                    dsid, substId, comp, subcomp,name, name2, cas, tag, unit)
+            select distinct
+                    id, substId, comp, subcomp,name, name2, cas, tag, unit
+            from labels_inventory;
+            """)
 
-        sql_command = """
-        update or ignore labels_out
-        set ardaid=(select ardaid from old_labels ol
-                    where labels_out.substId=ol.substId
-                    and labels_out.comp=ol.comp
-                    and labels_out.subcomp = ol.subcomp
-                    and labels_out.unit = ol.unit)
-        where labels_out.ardaid is null;
-        """
-        self._updatenull_log(sql_command, 'labels_out', 'ardaid', log_msg=
-                " Matched {} with ArdaID from old labels, out of {} unmatched rows."
-                )
+            c.execute("""
+            insert into labels_out(
+                substid, comp, subcomp, name, name2, cas, tag, unit)
+            select distinct
+                lc.substid, lc.comp, lc.subcomp, lc.name, lc.name2, lc.cas,
+                lc.tag, lc.unit
+            from labels_char lc
+            where not exists(select 1 from labels_out lo
+                             where lo.substid=lc.substid
+                             and lo.comp = lc.comp
+                             and lo.subcomp = lc.subcomp
+                             and lo.unit = lc.unit)
+            """)  # TODO: could improve labels_out, minimum data, then left join
+            # for cas, ardaid, name2, etc.
 
+            sql_command = """
+            update or ignore labels_out
+            set ardaid=(select ardaid from old_labels ol
+                        where labels_out.substId=ol.substId
+                        and labels_out.comp=ol.comp
+                        and labels_out.subcomp = ol.subcomp
+                        and labels_out.unit = ol.unit)
+            where labels_out.ardaid is null;
+            """
+            self._updatenull_log(sql_command, 'labels_out', 'ardaid', log_msg=
+                    " Matched {} with ArdaID from old labels, out of {} unmatched rows."
+                    )
 
-        # MATCH LABEL_OUT ROW WITH CHARACTERISATION FACTORS
 
-        # first match based on perfect comp correspondence
-        c.execute(
-        """
-        INSERT INTO obs2char(
-            flowId, impactId, factorId, factorValue, scheme)
-        SELECT DISTINCT
-            lo.id, f.impactId, f.factorId, f.factorValue, f.method
-        FROM
-            labels_out lo, factors f
-        WHERE
-            lo.substId = f.substId AND
-            lo.comp = f.comp AND
-            lo.subcomp = f.subcomp AND
-            f.method = '{}' AND
-            lo.unit = f.unit;
-        """.format(scrub(self.char_method)))
-        self.log.info("Matched {} flows and factors, with exact subcomp"
-                      " matching".format(c.rowcount))
-
-        # second insert for approximate subcomp
-        c.execute(
-        """
-        INSERT or ignore INTO obs2char(
-            flowId, impactId, factorId, factorValue, scheme)
-        SELECT DISTINCT
-            lo.id, f.impactId, f.factorId, f.factorValue, f.method
-        FROM
-            labels_out lo, factors f, obs2char_subcomps ocs
-        WHERE
-            lo.substId = f.substId AND
-            lo.comp = f.comp AND
-            lo.subcomp = ocs.obs_sc AND ocs.char_sc = f.subcomp AND
-            f.method = '{}' AND
-            lo.unit = f.unit;
-        """.format(scrub(self.char_method)))
-        self.log.info("Matched {} flows and factors, with approximate subcomp"
-                      " matching".format(c.rowcount))
-
-        # third insert for subcomp 'unspecified'
-        c.execute(
-        """
-        INSERT or ignore INTO obs2char(
-            flowId, impactId, factorId, factorValue, scheme)
-        SELECT DISTINCT
-            lo.id, f.impactId, f.factorId, f.factorValue, f.method
-        FROM
-            labels_out lo, factors f, obs2char_subcomps ocs
-        WHERE
-            lo.substId = f.substId AND
-            lo.comp = f.comp AND
-            f.subcomp = 'unspecified' AND
-            f.method = '{}' AND
-            lo.unit = f.unit;
-        """.format(scrub(self.char_method)))
-        self.log.info("Matched {} flows and factors, with 'unspecified' subcomp"
-                      " matching".format(c.rowcount))
-
-        # fourth insert for subcomp fallback
-        c.execute(
-        """
-        INSERT or ignore INTO obs2char(
-            flowId, dsid, impactId, factorId, factorValue, scheme)
-        SELECT DISTINCT
-            lo.id, lo.dsid, f.impactId, f.factorId, f.factorValue, f.method
-        FROM
-            labels_out lo, factors f, fallback_sc fsc
-        WHERE
-            lo.substId = f.substId AND
-            lo.comp = f.comp AND lo.comp=fsc.comp AND
-            f.subcomp=fsc.fallbacksubcomp AND
-            f.method = '{}' AND
-            lo.unit = f.unit;
-        """.format(scrub(self.char_method)))
-        self.log.info("Matched {} flows and factors, by falling back to a "
-                      "default subcompartment".format(c.rowcount))
+            # MATCH LABEL_OUT ROW WITH CHARACTERISATION FACTORS
+            # obs2char's unique constraint already discards repeated matches
+            # of a flow and impact, so no DISTINCT sort is needed
 
+            # first match based on perfect comp correspondence
+            c.execute(
+            """
+            INSERT INTO obs2char(
+                flowId, impactId, factorId, factorValue, scheme)
+            SELECT
+                lo.id, f.impactId, f.factorId, f.factorValue, f.method
+            FROM labels_out lo
+            INNER JOIN factors f
+                ON lo.substId = f.substId AND lo.comp = f.comp AND
+                   lo.subcomp = f.subcomp AND lo.unit = f.unit
+            WHERE f.method = ?;
+            """, (scrub(self.char_method),))
+            self.log.info("Matched {} flows and factors, with exact subcomp"
+                          " matching".format(c.rowcount))
+
+            # second insert for approximate subcomp
+            c.execute(
+            """
+            INSERT or ignore INTO obs2char(
+                flowId, impactId, factorId, factorValue, scheme)
+            SELECT
+                lo.id, f.impactId, f.factorId, f.factorValue, f.method
+            FROM labels_out lo
+            INNER JOIN obs2char_subcomps ocs
+                ON lo.subcomp = ocs.obs_sc
+            INNER JOIN factors f
+                ON lo.substId = f.substId AND lo.comp = f.comp AND
+                   ocs.char_sc = f.subcomp AND lo.unit = f.unit
+            WHERE f.method = ?;
+            """, (scrub(self.char_method),))
+            self.log.info("Matched {} flows and factors, with approximate subcomp"
+                          " matching".format(c.rowcount))
+
+            # third insert for subcomp 'unspecified'
+            c.execute(
+            """
+            INSERT or ignore INTO obs2char(
+                flowId, impactId, factorId, factorValue, scheme)
+            SELECT
+                lo.id, f.impactId, f.factorId, f.factorValue, f.method
+            FROM labels_out lo
+            INNER JOIN factors f
+                ON lo.substId = f.substId AND lo.comp = f.comp AND
+                   lo.unit = f.unit
+            WHERE f.subcomp = 'unspecified' AND f.method = ?;
+            """, (scrub(self.char_method),))
+            self.log.info("Matched {} flows and factors, with 'unspecified' subcomp"
+                          " matching".format(c.rowcount))
+
+            # fourth insert for subcomp fallback
+            c.execute(
+            """
+            INSERT or ignore INTO obs2char(
+                flowId, dsid, impactId, factorId, factorValue, scheme)
+            SELECT
+                lo.id, lo.dsid, f.impactId, f.factorId, f.factorValue, f.method
+            FROM labels_out lo
+            INNER JOIN fallback_sc fsc
+                ON lo.comp = fsc.comp
+            INNER JOIN factors f
+                ON lo.substId = f.substId AND lo.comp = f.comp AND
+                   f.subcomp = fsc.fallbacksubcomp AND lo.unit = f.unit
+            WHERE f.method = ?;
+            """, (scrub(self.char_method),))
+            self.log.info("Matched {} flows and factors, by falling back to a "
+                          "default subcompartment".format(c.rowcount))
+
+        # Anti-joins, probing the obs2char and labels_out indexes per row
         sql_command="""SELECT DISTINCT *
                        FROM labels_out lo
-                       WHERE lo.id NOT IN (SELECT DISTINCT flowId
-                                           FROM obs2char)
+                       WHERE NOT EXISTS (SELECT 1 FROM obs2char o
+                                         WHERE o.flowId = lo.id)
                        order by name;"""
         unchar_flow=pd.read_sql(sql_command, self.conn)
         filename = os.path.join(self.log_dir,'uncharacterized_flows.csv')
@@ -3739,11 +4291,11 @@ class Ecospold2Matrix(object):
         sql_command="""
                        select distinct s.substId, s.aName, s.cas, s.tag
                        from substances s
-                       where s.substId not in (
-                            select distinct lo.substid
+                       where not exists (
+                            select 1
                             from labels_out lo
-                            where lo.id in (select distinct flowId
-                                            from obs2char)
+                            inner join obs2char o on o.flowId = lo.id
+                            where lo.substid = s.substId
                             )
                        order by s.aName;
                        """
@@ -3755,24 +4307,13 @@ class Ecospold2Matrix(object):
                          "substances, see {}".format(unchar_subst.shape[0],
                                                      filename))
 
-        # Gett unmatcheds substances sans land-use issues
-        c.execute("""
-                     select count(*) from (
-                       select distinct s.substId, s.aName, s.cas, s.tag
-                       from substances s
-                       where s.substId not in (
-                            select distinct lo.substid
-                            from labels_out lo
-                            where lo.id in (select distinct flowId
-                                            from obs2char)
-                            )
-                        and s.aName not like 'transformation%'
-                        and s.aName not like 'occupation%'
-                        );
-                       """)
+        # Count unmatched substances sans land-use issues, from the table
+        # just read rather than with another pass over the database
+        landuse = unchar_subst.aName.str.match('transformation|occupation',
+                                               case=False, na=True)
         self.log.warning("Of these uncharacterized 'substances', {} are "
                          " not land occupation or transformation.".format(
-                                c.fetchone()[0]))
+                                (~landuse).sum()))
 
 
     def generate_characterized_extensions(self):
@@ -3787,19 +4328,31 @@ class Ecospold2Matrix(object):
         self.IMP.set_index('impactId',drop=False,inplace=True)
         self.IMP.index.name='index'
 
-        # get table and pivot
-        obs2char = pd.read_sql("select * from obs2char", self.conn)
-        self.C = pd.pivot_table(obs2char,
-                           values='factorValue',
-                           columns='flowId',
-                           index='impactId').reindex(self.STR.index, axis=1)
-        self.C = self.C.reindex(self.IMP.index, axis=0)
-
-
+        # get table and pivot it from its coordinates, averaging duplicates
+        # as pivot_table would, without allocating a dense IMP x STR matrix
+        obs2char = pd.read_sql("select impactId, flowId, factorValue"
+                               " from obs2char", self.conn)
+        factors = obs2char.groupby(['impactId', 'flowId'],
+                                   sort=False)['factorValue'].mean()
+        i = self.IMP.index.get_indexer(factors.index.get_level_values(0))
+        j = self.STR.index.get_indexer(factors.index.get_level_values(1))
+        bo = (i >= 0) & (j >= 0)
+        C = scipy.sparse.csc_matrix(
+                (factors.values[bo], (i[bo], j[bo])),
+                shape=(len(self.IMP.index), len(self.STR.index)))
+        self.C = pd.DataFrame.sparse.from_spmatrix(C, index=self.IMP.index,
+                                                   columns=self.STR.index)
+
+
+
+        # Totals to check that reordering neither loses nor duplicates flows,
+        # summed column by column rather than on a densified copy of F
+        if __debug__:
+            F_sum = self.F.sum().sum()
+            F_positives = (self.F > 0).sum().sum()
 
         # TODO: is this step necessary?
         # Reorganize elementary flows to follow STR order
-        Forg = self.F.fillna(0)
         self.F = self.F.reindex(self.STR.loc[:, 'dsid'].values, axis=0)
         self.F.index = self.STR.index.copy()
 
@@ -3810,8 +4363,8 @@ class Ecospold2Matrix(object):
         self.F = self.F.astype(self.sformat)
 
         # safety assertions
-        assert(np.allclose(self.F.values.sum(), Forg.values.sum()))
-        assert((self.F.values > 0).sum() == (Forg.values > 0).sum())
+        assert(np.allclose(self.F.sum().sum(), F_sum))
+        assert((self.F > 0).sum().sum() == F_positives)
 
 
     def make_compatible_with_arda(self, ardaidmatching_file):
@@ -3847,11 +4400,10 @@ class Ecospold2Matrix(object):
             # Start above the maximum historical ID (+ step, for buffer)
             anId = old_label.ardaid.max() + step
 
-            # Loop through all rows, fix NaN or Null ArdaIds
-            for i, row in label.iterrows():
-                if not row['ardaid'] > 0:
-                    anId +=1
-                    label.loc[i,'ardaid'] = anId
+            # Serially number all rows with NaN or Null ArdaIds, in order
+            missing = ~(label[column] > 0)
+            label.loc[missing, column] = np.arange(anId + 1,
+                                                   anId + 1 + missing.sum())
 
             # Make sure all Ids are unique to start with
             if len(label.loc[:, column].unique()) != len(label.loc[:, column]):
@@ -3881,11 +4433,10 @@ class Ecospold2Matrix(object):
             * ArdaId must be second
             * Unit must be last
             """
-            for i in fullnamecols:
-                try:
-                    full = full + '/' + label[i]
-                except NameError:
-                    full = label[i]
+            # Rows with a missing value in any of these columns get a null
+            # fullname
+            full = label[fullnamecols[0]].str.cat(label[fullnamecols[1:]],
+                                                  sep='/')
             full.name='fullname'
             l = pd.concat([full,
                            label[firstcols],
@@ -3913,11 +4464,10 @@ class Ecospold2Matrix(object):
         # For new stressors, complement STR with new ArdaID
         self.STR = complement_ardaid(self.STR, self.STR_old, name='STR')
 
-        # Match IMP ArdaID based on acronym
-        a = pd.merge(self.IMP.reset_index(), self.IMP_old[['ardaid','accronym']],
-                     left_on='impactId', right_on='accronym',
-                     how='left', copy=True)
-        a = finalize_indexes(a, self.IMP.index, duplicate_cols=['accronym'])
+        # Match IMP ArdaID based on acronym, a simple lookup
+        a = self.IMP.copy()
+        a['ardaid'] = a['impactId'].map(
+                self.IMP_old.set_index('accronym')['ardaid'])
         self.IMP = complement_ardaid(a, self.IMP_old, name='IMP')
 
 
@@ -3946,7 +4496,9 @@ class Ecospold2Matrix(object):
 
     def _updatenull_log(self, sql_command, table, col,
                 log_msg="Updated {} out of {} null values"):
-
+        """ Run an UPDATE of the null values of a column, and log how many got
+        filled. The UPDATE should only touch rows where the column is null
+        """
 
         # define test command to detect updated null values
         testcommand = """ select count(*) from {} where {} is null;
@@ -3959,19 +4511,101 @@ class Ecospold2Matrix(object):
         c.execute(testcommand)
         i0 = c.fetchone()[0]
 
-        # do the deed
-        c.execute(sql_command)
-        self.conn.commit()
-
-        # see how many null values are left
-        c.execute(testcommand)
-        i1 = c.fetchone()[0]
+        # do the deed, committed by the caller, and see how many null values
+        # are left. With RETURNING (sqlite 3.35+), from the updated values
+        # rather than by counting again
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            c.execute('{} returning {}'.format(sql_command.strip().rstrip(';'),
+                                               scrub(col)))
+            i1 = i0 - sum(value is not None for (value,) in c.fetchall())
+        else:
+            c.execute(sql_command)
+            c.execute(testcommand)
+            i1 = c.fetchone()[0]
 
         # log results
         self.log.info(log_msg.format(scrub(str(i0-i1)), scrub(str(i0))))
         return i0-i1
 
+    def _insert_rows(self, table, df, distinct=False, verb='insert'):
+        """ Bulk insert all rows of a DataFrame in a sqlite table, in a single
+        executemany rather than through a staging table
+
+        Args:
+        -----
+        * table:    name of the sqlite table
+        * df:       DataFrame, with columns named as those of the table
+        * distinct: whether to skip duplicate rows, as select distinct
+        * verb:     'insert', or e.g. 'insert or ignore'
+
+        """
+        if distinct:
+            df = df.drop_duplicates()
+
+        # missing values as NULL, numpy scalars as python types
+        rows = df.astype(object).where(df.notna(), None)
+        sql = "{} into {}({}) values ({});".format(
+                verb, scrub(table), ', '.join(scrub(i) for i in df.columns),
+                ', '.join('?' * len(df.columns)))
+        self.conn.executemany(sql, rows.itertuples(index=False, name=None))
+
+
+def _release(elem):
+    """ Free an element processed by iterparse, along with its preceding
+    siblings, to keep memory use flat while streaming through large files
+    """
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
 
+def _sort_labels(df, by):
+    """ Sort labels by columns, as df.sort_values(by=by), but with a single
+    np.lexsort over the integer codes of the columns (NaN last)
+    """
+    keys = []
+    for col in reversed(by):
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            codes = df[col].cat.codes.values
+        else:
+            codes = pd.factorize(df[col], sort=True)[0]
+        keys.append(np.where(codes < 0, np.iinfo(np.int64).max, codes))
+    order = np.lexsort(keys)
+
+    # Labels often come already sorted (e.g. re-sorting after fixes)
+    if (np.diff(order) == 1).all():
+        return df
+    return df.iloc[order]
+
+
+def _harmonize_labels(df):
+    """ Trim and harmonize units, compartments and names of a label DataFrame,
+    in memory, as the opening updates of clean_label would in sqlite
+    """
+    df = df.copy()
+
+    def strip(col, lower=False):
+        # only strings are changed, and only spaces trimmed, as sqlite trim()
+        s = df[col].astype(object)
+        new = s.str.lower() if lower else s
+        return new.str.strip(' ').fillna(s)
+
+    for col in ('unit', 'name', 'name2', 'cas'):
+        if col in df:
+            df[col] = strip(col)
+    df['unit'] = df['unit'].replace({'Nm3': 'm3', 'm2*year': 'm2a',
+                                     'm3*year': 'm3a'})
+
+    df['comp'] = strip('comp', lower=True).replace(
+        {'raw': 'resource', 'natural resource': 'resource'})
+    df['subcomp'] = strip('subcomp', lower=True).fillna('unspecified').replace(
+        {'(unspecified)': 'unspecified', '': 'unspecified',
+         'low. pop.': 'low population density',
+         'high. pop.': 'high population density'})
+    return df
+
+
+@functools.lru_cache(maxsize=None)
 def scrub(table_name):
-    return ''.join( chr for chr in table_name
-                    if chr.isalnum() or chr == '_')
+    # Keep only word characters (alphanumerics and underscores)
+    return re.sub(r'\W', '', table_name)
@@ -52,6 +52,8 @@ CONSTRAINT namePerSubstance UNIQUE(aName, tag)
 	-- though mostly for readability, aName still used in matching
 	-- ensure no name conflict
 );
+-- name matching is case-insensitive
+CREATE INDEX substancesByName ON substances(aName COLLATE NOCASE, tag);
 
 DROP TABLE IF EXISTS schemes;
 CREATE TABLE schemes(
@@ -68,6 +70,7 @@ substId	    TEXT    REFERENCES substances,
 UNIQUE(NAME, tag),  --enforce a many-to-1 relation between name and substid
 UNIQUE(NAME, tag, substId)  --enforce a many-to-1 relation between name and substid
 );
+CREATE INDEX namesByName ON Names(name COLLATE NOCASE, tag);
 
 DROP TABLE IF EXISTS nameHasScheme;
 CREATE TABLE nameHasScheme(
@@ -103,6 +106,8 @@ unit        TEXT NOT NULL,
 substId     INTEGER,
 CONSTRAINT hasAName CHECK((name IS NOT NULL) OR (name2 IS NOT NULL) OR (name3 IS NOT NULL) )
 );
+-- ardaid of labels_out looked up by substance and compartments
+CREATE INDEX oldLabelsBySubst ON old_labels(substId, comp, subcomp, unit);
 
 DROP TABLE IF EXISTS impacts;
 CREATE TABLE impacts (
@@ -130,6 +135,9 @@ UNIQUE (substId, comp, subcomp, unit, impactId, method, factorValue)
 -- The unique constraint makes sense, but remove and check manually to facilitate
 -- 	logging and idenfying source of conflict
 );
+-- factors are matched to labels_out by substance, compartment and unit, with
+-- exact, approximate, unspecified or fallback subcompartments
+CREATE INDEX factorsByFlow ON factors(substId, comp, unit, subcomp, method);
 
 DROP TABLE IF EXISTS labels_inventory;
 CREATE TABLE labels_inventory(
@@ -188,6 +196,9 @@ CONSTRAINT hasAName CHECK(NAME IS NOT NULL OR name2 IS NOT NULL),
 FOREIGN KEY (name, tag) REFERENCES names(name, tag),
 FOREIGN KEY (name2, tag) REFERENCES names(name, tag)
 );
+-- characterisation labels checked against inventory ones, by substance and
+-- compartments
+CREATE INDEX labelsOutBySubst ON labels_out(substId, comp, subcomp, unit);
 
 --==========================================
 -- MATCHING ELEMENTARY FLOWS ANC CHAR FACTORS
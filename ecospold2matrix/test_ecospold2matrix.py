@@ -1,5 +1,10 @@
 import ecospold2matrix as e2m
 import unittest
+import functools
+import copy
+import os
+import tempfile
+import unittest.mock
 import pandas as pd
 import pandas.util.testing as pdt
 import numpy as np
@@ -9,28 +14,42 @@ import numpy as np
 # TODO: make sure order is respected in final export
 #[Apos, Fpos] = e2m.normalize_flows(Z, G, output, True)
 
+@functools.lru_cache(maxsize=None)
+def _parse_test_data(filename, parse_dates=False):
+    return pd.read_csv('./test_data/' + filename, sep='|', index_col=0,
+                       parse_dates=parse_dates)
+
+def read_test_data(filename, parse_dates=False):
+    """ Reads a test value file, parsing each file only once per session
+
+    parse_dates=True reads as the old DataFrame.from_csv() did. Callers get
+    their own copy, free to modify.
+    """
+    return _parse_test_data(filename, parse_dates).copy()
+
 class TestE2M(unittest.TestCase):
 
 
-    def setUp(self):
-        self.sysdir='./test_data/'
-        self.name = 'test'
+    @classmethod
+    def setUpClass(cls):
+        cls.sysdir='./test_data/'
+        cls.name = 'test'
 
         prod = ['foo', 'waste']
         act = ['BAR', 'PUP']
 
-        self.activities = pd.DataFrame(
+        cls.activities = pd.DataFrame(
                 [['BAR', 0, '1984-12-18', '2008-08-01'],
                  ['PUB', 0, '1984-12-18', '2008-08-01']],
                 index=['BAR','PUB'],
                 columns=['activityId','activityType','startDate','endDate'])
-        self.products = pd.DataFrame(
+        cls.products = pd.DataFrame(
                 [['foo', 'foo', 'kg', 'kg'],
                  ['waste', 'waste', 'kg', 'kg']],
                 index=['foo','waste'],
                 columns=['productId','productName','unitId','unitName'])
 
-        self.inflows = pd.DataFrame(
+        cls.inflows = pd.DataFrame(
                 [['BAR_foo',    'BAR',  'foo',       0.3],
                  ['BAR_foo',    'PUB',  'waste',    -0.1],
                  ['PUB_waste',  'PUB',  'waste',    -0.02]],
@@ -39,7 +58,7 @@ class TestE2M(unittest.TestCase):
         outflow_list =[['BAR_foo',    'foo',  1., 100, 0],
                      ['PUB_waste',  'waste', -1., .01, 0]] 
 
-        self.outflows = pd.DataFrame(
+        cls.outflows = pd.DataFrame(
                 outflow_list,
                 columns=['fileId',
                          'productId',
@@ -48,56 +67,77 @@ class TestE2M(unittest.TestCase):
                          'outputGroup'],
                 index=[row[0] for row in outflow_list])
 
-        #self.Z = pd.DataFrame(
+        #cls.Z = pd.DataFrame(
         #        [[ 0.3,      0.    ],
         #         [-0.1,     -0.02  ]], index=prod, columns=prod)
 
-        self.elementary_flows = pd.DataFrame(
+        cls.elementary_flows = pd.DataFrame(
                 [['BAR_foo', 'CO2',  10],
                 ['PUB_waste', 'CH4', 0.3]],
                 columns=['fileId', 'elementaryExchangeId', 'amount'])
 
         list_A_label = [['BAR_foo', 'kg'],
                         ['PUB_waste', 'kg']]
-        self.A_label = pd.DataFrame(
+        cls.A_label = pd.DataFrame(
                 list_A_label,
                 columns=['fileId','unit'],
                 index = [row[0] for row in list_A_label])
 
-        self.F_label = self.elementary_flows.iloc[:,1]
-        self.F_label.index = self.F_label.values
+        ids = cls.elementary_flows['elementaryExchangeId'].values
+        cls.F_label = pd.Series(ids, index=ids, name='elementaryExchangeId')
 
-        a = {'BAR_foo':   {'BAR_foo': 0.3,
-                           'PUB_waste': -0.1},
-             'PUB_waste': {'BAR_foo': np.nan,
-                           'PUB_waste': 0.02}}
-        self.A = pd.DataFrame.from_dict(a).reindex(index=self.A_label.index,
-                                                   columns=self.A_label.index)
+        # Expected matrices, rows and columns in the order of the labels
+        cls.A = pd.DataFrame([[ 0.3,   np.nan],
+                              [-0.1,   0.02  ]],
+                             index=cls.A_label.index,
+                             columns=cls.A_label.index)
 
-        f = {'BAR_foo'  : {'CH4': np.nan,
-                           'CO2': 10.0},
-             'PUB_waste': {'CH4': -0.3,
-                           'CO2': np.nan}}
+        cls.F = pd.DataFrame([[10.0,   np.nan],
+                              [np.nan, -0.3  ]],
+                             index=cls.F_label.index,
+                             columns=cls.A_label.index)
 
-        self.F = pd.DataFrame.from_dict(f).reindex(index=self.F_label.index,
-                                                   columns=self.A_label.index)
+        cls.Z = pd.DataFrame([[ 30.0,  np.nan],
+                              [-10.0,  0.00020000000000000001]],
+                             index=cls.A_label.index,
+                             columns=cls.A_label.index)
 
-        z = {'BAR_foo':   {'BAR_foo': 30.0,
-                           'PUB_waste': -10.0},
-             'PUB_waste': {'BAR_foo': np.nan,
-                           'PUB_waste': 0.00020000000000000001}}
-        self.Z = pd.DataFrame.from_dict(z).reindex_like(self.A)
+        cls.G_pro = pd.DataFrame([[1000.0, np.nan],
+                                  [np.nan, -0.0030000000000000001]],
+                                 index=cls.F_label.index,
+                                 columns=cls.A_label.index)
 
+    # Fixtures built once in setUpClass, copied for each test as the parser
+    # may modify the frames it is handed
+    _fixtures = ('activities', 'products', 'inflows', 'outflows',
+                 'elementary_flows', 'A_label', 'F_label', 'A', 'F', 'Z',
+                 'G_pro')
 
-        g = {'BAR_foo':   {'CH4': np.nan,
-                           'CO2': 1000.0},
-             'PUB_waste': {'CH4': -0.0030000000000000001,
-                           'CO2': np.nan}}
-        self.G_pro = pd.DataFrame.from_dict(g).reindex_like(self.F)
+    def setUp(self):
+        for name in self._fixtures:
+            setattr(self, name, getattr(type(self), name).copy())
+
+    def new_parser(self):
+        """ Returns a parser for one test, sharing the construction, and the
+        connection to the characterisation database, of a single instance
+
+        Under a project name of its own, so that tests constructing parsers
+        explicitly do not delete its database and log from under it
+        """
+        cls = type(self)
+        if not hasattr(cls, '_parser'):
+            cls._parser = e2m.Ecospold2Matrix(cls.sysdir, cls.name + '_shared')
+        return copy.copy(cls._parser)
+
+    @classmethod
+    def tearDownClass(cls):
+        if hasattr(cls, '_parser'):
+            cls._parser.conn.close()
 
     def test_execute_log(self):
 
         parser = e2m.Ecospold2Matrix(self.sysdir, self.name, verbose=True)
+        self.addCleanup(parser.conn.close)
 
         c = parser.conn.cursor()
         c.executescript("""
@@ -110,9 +150,10 @@ class TestE2M(unittest.TestCase):
                 aName text  unique,
                 anId    int unique);
                 """)
-        c.execute(""" insert or ignore into foo values ('soleil', NULL);""")
-        c.execute(""" insert or ignore into foo values ('lune', NULL);""")
-        c.execute(""" insert or ignore into fou values ('soleil', 8);""")
+        with parser.conn:
+            c.executemany(""" insert or ignore into foo values (?, NULL);""",
+                          [('soleil',), ('lune',)])
+            c.execute(""" insert or ignore into fou values ('soleil', 8);""")
 
         sql_command = """ update foo
         set anId = (select distinct fou.anId
@@ -133,26 +174,25 @@ class TestE2M(unittest.TestCase):
         if cols is not None:
             # In case of meaningless indexes, order relative to column and
             # reindex
-            x = x.sort(x.columns[cols])
+            x = x.sort_values(x.columns[cols], kind='mergesort')
             x = x.reset_index(drop=True)
-            y = y.sort(y.columns[cols])
+            y = y.sort_values(y.columns[cols], kind='mergesort')
             y = y.reset_index(drop=True)
+            pdt.assert_frame_equal(x,y)
         else:
             # If index meaninful, sort relative to it
-            x = x.sort()
-            y = y.sort()
-
-        pdt.assert_frame_equal(x,y)
+            pdt.assert_frame_equal(x.sort_index(kind='mergesort'),
+                                   y.sort_index(kind='mergesort'))
         
 
     def test_extract_products(self):
 
         # Load test value from csv file
-        products0 = pd.DataFrame.from_csv('./test_data/products.csv', sep='|')
+        products0 = read_test_data('products.csv', parse_dates=True)
         products0.rename(columns={'productId.1':'productId'}, inplace=True)
 
         # build product list
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.extract_products()
 
         pdt.assert_frame_equal(products0, parser.products)
@@ -160,10 +200,10 @@ class TestE2M(unittest.TestCase):
     def test_extract_activities(self):
 
         # Load test values from csv file
-        activities0 = pd.read_csv('./test_data/activities.csv', sep='|', index_col=0)
+        activities0 = read_test_data('activities.csv')
 
         # build activity list
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.extract_activities()
 
         pdt.assert_frame_equal(activities0, parser.activities)
@@ -171,33 +211,46 @@ class TestE2M(unittest.TestCase):
     def test_build_STR(self):
 
         # Read test values from csv file
-        STR0 = pd.read_csv('./test_data/STR.csv', sep='|', index_col=0)
+        STR0 = read_test_data('STR.csv')
         STR0.index.name = 'id'
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.build_STR()
 
         pdt.assert_frame_equal(STR0, parser.STR)
 
     def test_build_PRO(self):
         # Read test values from csv file
-        PRO0 = pd.read_table('./test_data/PRO.csv', sep='|', index_col=0)
+        PRO0 = read_test_data('PRO.csv')
 
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.build_PRO()
 
         pdt.assert_frame_equal(PRO0, parser.PRO)
 
 
 
+    def test_build_PRO_ids_only(self):
+
+        # Order by a label known without parsing, unlike the files' order
+        parser = self.new_parser()
+        parser.PRO_order = ['productId']
+        parser.build_PRO()
+        PRO1 = parser.PRO
+        parser.build_PRO(detail_level=0)
+
+        pdt.assert_index_equal(PRO1.index, parser.PRO.index)
+        pdt.assert_frame_equal(PRO1[['activityId', 'productId']],
+                               parser.PRO[['activityId', 'productId']])
+        self.assertEqual(list(PRO1.columns), list(parser.PRO.columns))
+
     def test_extract_flows(self):
 
         # Read test values from csv file
-        inflows0 = pd.read_table('./test_data/inflows.csv', sep='|', index_col=0)
-        outflows0 = pd.read_table('./test_data/outflows.csv', sep='|', index_col=0)
-        elementary_flows0 = pd.read_table('./test_data/elementary_flows.csv',
-                                          sep='|', index_col=0)
+        inflows0 = read_test_data('inflows.csv')
+        outflows0 = read_test_data('outflows.csv')
+        elementary_flows0 = read_test_data('elementary_flows.csv')
 
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.extract_flows()
 
         self.assert_same_but_roworder(inflows0, parser.inflows, 0)
@@ -205,18 +258,59 @@ class TestE2M(unittest.TestCase):
         self.assert_same_but_roworder(elementary_flows0,
                                       parser.elementary_flows,0)
 
+    def test_parallel_parsing(self):
+        """ Parsing in worker processes gives the same as in this process """
+
+        results = []
+        for max_workers in (1, 2):
+            parser = self.new_parser()
+            parser.max_workers = max_workers
+            parser.extract_flows()
+            parser.build_STR()
+            parser.build_PRO()
+            parser.build_E(data_folder=self.sysdir + 'datasets')
+            results.append(parser)
+        serial, pooled = results
+
+        for attr in ('inflows', 'outflows', 'elementary_flows', 'PRO', 'E'):
+            pdt.assert_frame_equal(getattr(serial, attr),
+                                   getattr(pooled, attr))
+
+    def test_calculate_E_cache(self):
+        """ A later parser reuses the cummulative LCI calculated by another """
+
+        name = self.name + '_Ec'
+        A = self.A.fillna(0)
+        F = self.F.fillna(0)
+
+        def calculate_E(out_dir):
+            parser = e2m.Ecospold2Matrix(self.sysdir, name, out_dir)
+            parser.prefer_pickles = True
+            try:
+                return parser._Ecospold2Matrix__calculate_E(A, F)
+            finally:
+                parser.conn.close()
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            Ec0 = calculate_E(out_dir)
+            with unittest.mock.patch('scipy.sparse.linalg.splu',
+                                     side_effect=AssertionError('recalculated')):
+                Ec1 = calculate_E(out_dir)
+        os.remove(name + '_characterisation.db')
+
+        pdt.assert_frame_equal(Ec0, Ec1)
+
     def test_complement_labels(self):
 
         # Read test values from csv file
-        PRO0 = pd.DataFrame.from_csv('./test_data/PRO_full.csv', sep='|')
+        PRO0 = read_test_data('PRO_full.csv', parse_dates=True)
 
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
-        products0 = pd.DataFrame.from_csv('./test_data/products.csv', sep='|')
+        parser = self.new_parser()
+        products0 = read_test_data('products.csv', parse_dates=True)
         parser.products = products0.rename(columns={'productId.1':'productId'})
-        parser.activities = pd.read_csv('./test_data/activities.csv',
-                                        sep='|', index_col=0)
-        parser.STR = pd.read_csv('./test_data/STR.csv', sep='|', index_col=0)
-        parser.PRO = pd.read_table('./test_data/PRO.csv', sep='|', index_col=0)
+        parser.activities = read_test_data('activities.csv')
+        parser.STR = read_test_data('STR.csv')
+        parser.PRO = read_test_data('PRO.csv')
 
         parser.complement_labels()
 
@@ -225,7 +319,7 @@ class TestE2M(unittest.TestCase):
         
 
     def test_build_AF(self):
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.inflows = self.inflows
         parser.outflows = self.outflows
         parser.elementary_flows = self.elementary_flows
@@ -237,7 +331,7 @@ class TestE2M(unittest.TestCase):
         pdt.assert_frame_equal(self.F, parser.F)
 
     def test_build_AF_positive_waste(self):
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.inflows = self.inflows
         parser.outflows = self.outflows
         parser.elementary_flows = self.elementary_flows
@@ -269,7 +363,7 @@ class TestE2M(unittest.TestCase):
 
     def test_scale_up_AF(self):
 
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.outflows = self.outflows
         parser.PRO = self.A_label
         parser.STR = self.F_label
@@ -308,7 +402,7 @@ class TestE2M(unittest.TestCase):
                          ).reindex(self.F_label.index)
 
 
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.activities = self.activities
         parser.products = self.products
         parser.inflows = testflows
@@ -340,7 +434,7 @@ class TestE2M(unittest.TestCase):
         U0 = pd.DataFrame({"BAR":{"foo":0.3, "waste":-0.1},
                            "PUB":{"foo":np.nan, "waste":-0.02}})
         
-        parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser = self.new_parser()
         parser.activities = self.activities
         parser.products = self.products
         parser.inflows = testflows
@@ -358,7 +452,9 @@ class TestE2M(unittest.TestCase):
         """ Not technically a unit test... More a
         it-runs-through-and-does-not-crash integration test"""
 
+        # Construct explicitly, as this is what is being run through
         parser = e2m.Ecospold2Matrix(self.sysdir, self.name)
+        parser.conn.close()
 
 if __name__ == '__main__':
     unittest.main()
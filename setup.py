@@ -1,6 +1,10 @@
+import re
 from setuptools import setup
 
-exec(open('ecospold2matrix/version.py').read())
+# Read the version string without executing the module
+with open('ecospold2matrix/version.py') as f:
+    __version__ = re.search(r"__version__\s*=\s*['\"]([^'\"]+)['\"]",
+                            f.read()).group(1)
 
 setup(
     name='ecospold2matrix',